@@ -0,0 +1,249 @@
+from datetime import datetime, UTC
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+
+from models import db, Position, StockPick, TradeHistory
+
+TRADING_DAYS = 252
+
+
+def calculate_performance(status, entry_price, exit_price):
+    # Percent gain/loss of a long or short position
+    if status == 'long':
+        return ((exit_price - entry_price) / entry_price) * 100
+    return ((entry_price - exit_price) / entry_price) * 100
+
+
+class AnalyticsMemo:
+    """Memoizes analytics until a row of one of the tracked models is written.
+
+    Writes are detected from the session: flushed ORM objects as well as
+    bulk insert/update/delete statements against the tracked tables. The
+    version only moves on commit, so a rolled back write keeps the memo.
+    """
+
+    def __init__(self, models):
+        self.tables = {model.__table__ for model in models}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._memo = {}
+        self._lock = threading.Lock()
+        self.shared = None
+        self._shared_token = None
+
+    def share(self, backend, key='analytics_version'):
+        # With several worker processes, a write in any of them invalidates every memo
+        self.shared = backend
+        self.shared_key = key
+        self._shared_token = backend.get(key)
+
+    def install(self, session):
+        event.listen(session, 'after_flush', self._after_flush)
+        event.listen(session, 'do_orm_execute', self._on_execute)
+        event.listen(session, 'after_commit', self._after_commit)
+        event.listen(session, 'after_rollback', self._after_rollback)
+
+    def _touches(self, objects):
+        return any(getattr(obj, '__table__', None) in self.tables for obj in objects)
+
+    def _after_flush(self, session, flush_context):
+        if self._touches(session.new) or self._touches(session.dirty) or self._touches(session.deleted):
+            session.info['analytics_dirty'] = True
+
+    def _on_execute(self, state):
+        if state.is_insert or state.is_update or state.is_delete:
+            mapper = state.bind_mapper
+            if mapper is not None and mapper.local_table in self.tables:
+                state.session.info['analytics_dirty'] = True
+
+    def _after_commit(self, session):
+        if session.info.pop('analytics_dirty', False):
+            self.invalidate()
+
+    def _after_rollback(self, session):
+        session.info.pop('analytics_dirty', None)
+
+    def invalidate(self):
+        token = uuid.uuid4().hex if self.shared is not None else None
+        with self._lock:
+            self.version += 1
+            self._memo.clear()
+            self._shared_token = token
+        if token is not None:
+            self.shared.set(self.shared_key, token)
+
+    def _sync_shared(self):
+        token = self.shared.get(self.shared_key)
+        with self._lock:
+            if token != self._shared_token:
+                self._shared_token = token
+                self.version += 1
+                self._memo.clear()
+
+    def get(self, key, compute):
+        if self.shared is not None:
+            self._sync_shared()
+        with self._lock:
+            version = self.version
+            cached = self._memo.get(key)
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            # Don't store a result computed from data that changed meanwhile
+            if self.version == version:
+                self._memo[key] = (version, value)
+        return value
+
+
+# StockPick too: per-source stats attribute trades to the picks' sources
+memo = AnalyticsMemo([TradeHistory, Position, StockPick])
+
+
+def _series_stats(returns):
+    if len(returns) == 0:
+        return None
+    mean = returns.mean()
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    downside = returns[returns < 0]
+    downside_std = np.sqrt(np.mean(downside ** 2)) if len(downside) else 0.0
+    return {
+        'mean': float(mean),
+        'std': float(std),
+        'sharpe': float(mean / std) if std > 0 else None,
+        'sortino': float(mean / downside_std) if downside_std > 0 else None
+    }
+
+
+def _group_stats(frame, key):
+    grouped = frame.groupby(key, sort=False)['performance']
+    stats = pd.DataFrame({
+        'trades': grouped.size(),
+        'win_rate': (frame['performance'] > 0).groupby(frame[key], sort=False).mean(),
+        'average_return': grouped.mean(),
+        'total_return': grouped.sum(),
+        'best': grouped.max(),
+        'worst': grouped.min()
+    }).sort_values('total_return', ascending=False)
+    return [
+        dict({key: name}, **{col: float(val) if col != 'trades' else int(val) for col, val in row.items()})
+        for name, row in stats.iterrows()
+    ]
+
+
+def load_trades():
+    rows = db.session.query(
+        TradeHistory.id,
+        TradeHistory.ticker,
+        TradeHistory.performance,
+        TradeHistory.date_closed
+    ).order_by(TradeHistory.date_closed, TradeHistory.id).all()
+    return pd.DataFrame.from_records(rows, columns=['id', 'ticker', 'performance', 'date_closed'])
+
+
+def load_ticker_sources():
+    # Trades don't record where the idea came from; attribute a ticker to
+    # Manual if it was ever picked manually, else AI if the AI picked it
+    sources = {}
+    for ticker, source in db.session.query(StockPick.ticker, StockPick.source).distinct():
+        if sources.get(ticker) != 'Manual':
+            sources[ticker] = source
+    return sources
+
+
+def realized_analytics():
+    trades = load_trades()
+    if trades.empty:
+        return {'trades': 0}
+
+    returns = trades['performance'].to_numpy(dtype=float)
+    wins = returns > 0
+    gains = returns[wins].sum()
+    losses = -returns[returns < 0].sum()
+
+    # Equity curve assuming each trade is taken with the whole account in turn
+    equity = np.cumprod(1 + returns / 100)
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+
+    daily = trades.groupby('date_closed')['performance'].mean().to_numpy(dtype=float)
+    daily_stats = _series_stats(daily)
+    if daily_stats and daily_stats['sharpe'] is not None:
+        daily_stats['annualized_sharpe'] = daily_stats['sharpe'] * np.sqrt(TRADING_DAYS)
+
+    sources = load_ticker_sources()
+    trades['source'] = trades['ticker'].map(sources).fillna('Untracked')
+
+    return {
+        'trades': int(len(returns)),
+        'win_rate': float(wins.mean()),
+        'average_return': float(returns.mean()),
+        'median_return': float(np.median(returns)),
+        'best': float(returns.max()),
+        'worst': float(returns.min()),
+        'profit_factor': float(gains / losses) if losses > 0 else None,
+        'cumulative_return': float((equity[-1] - 1) * 100),
+        'max_drawdown': float(drawdown.min() * 100),
+        'current_drawdown': float(drawdown[-1] * 100),
+        'per_trade': _series_stats(returns),
+        'daily': daily_stats,
+        'first_closed': trades['date_closed'].iloc[0].isoformat(),
+        'last_closed': trades['date_closed'].iloc[-1].isoformat(),
+        'per_ticker': _group_stats(trades, 'ticker'),
+        'per_source': _group_stats(trades, 'source')
+    }
+
+
+def load_positions():
+    rows = db.session.query(Position.id, Position.ticker, Position.entry_price, Position.status).all()
+    frame = pd.DataFrame.from_records(rows, columns=['id', 'ticker', 'entry_price', 'status'])
+    return frame[frame['status'].isin(['long', 'short'])].reset_index(drop=True)
+
+
+def unrealized_analytics(positions, quotes):
+    """Mark open positions to the given {ticker: quote} snapshot."""
+    if positions.empty:
+        return {'positions': 0}
+
+    prices = positions['ticker'].map(
+        lambda t: (quotes.get(t) or {}).get('current_price')
+    ).to_numpy(dtype=float)
+    entry = positions['entry_price'].to_numpy(dtype=float)
+    direction = np.where(positions['status'].to_numpy() == 'long', 1.0, -1.0)
+    pnl = direction * (prices - entry) / entry * 100
+
+    priced = ~np.isnan(pnl)
+    by_position = [
+        {'id': int(i), 'ticker': t, 'status': s, 'unrealized': None if np.isnan(p) else float(p)}
+        for i, t, s, p in zip(positions['id'], positions['ticker'], positions['status'], pnl)
+    ]
+    return {
+        'positions': int(len(pnl)),
+        'priced': int(priced.sum()),
+        'average_unrealized': float(pnl[priced].mean()) if priced.any() else None,
+        'winning': int((pnl[priced] > 0).sum()),
+        'losing': int((pnl[priced] < 0).sum()),
+        'by_position': by_position
+    }
+
+
+def portfolio_analytics(quote_lookup):
+    """Realized stats from TradeHistory plus open positions marked to market.
+
+    quote_lookup(tickers) returns cached quotes and is only called for the
+    open positions' tickers; it must not go upstream.
+    """
+    realized = memo.get('realized', realized_analytics)
+    positions = memo.get('positions', load_positions)
+    quotes = quote_lookup(list(positions['ticker'].unique())) if not positions.empty else {}
+    return {
+        'realized': realized,
+        'unrealized': unrealized_analytics(positions, quotes),
+        'computed_at': datetime.now(UTC).isoformat()
+    }
@@ -1,399 +1,588 @@
-from flask import Flask, jsonify, request
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 from datetime import datetime, timedelta, UTC
-import requests
-import re
 import os
 from dotenv import load_dotenv
 from collections import Counter
 import time
 import random
+import json
 import logging
-import yfinance as yf
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from analytics import calculate_performance, memo as analytics_memo, portfolio_analytics
+from bulk import (
+    EXPORT_TYPES, ImportFormatError, export_rows, import_records, read_records,
+    validate_pick, validate_position, validate_trade
+)
+from database import (
+    LATEST_VERSION, begin_query_scope, configure_sqlite, end_query_scope, install_query_metrics, migrate
+)
+from models import db, StockPick, Position, TradeHistory, QuoteSnapshot
+from log_config import SAMPLED, configure_logging
+from listing import (
+    ListingError, filter_date_range, filter_in, keyset_page, list_response,
+    parse_csv, parse_date, parse_fields, parse_limit, project
+)
+from health import CircuitBreaker, TickerHealth
+from metrics import REGISTRY, ROUTE_LATENCY, TICKERS_EXTRACTED, TWEETS_SCANNED, CallbackGauge
+from mentions import MENTION_WINDOWS, top_mentioned, users_by_ticker_day
+from price_store import PriceStore
+from quote_cache import EMPTY_QUOTE, QuoteCache
+from quote_engine import fetch_quotes
+from refresher import BackgroundRefresher, Watchlist
+from sectors import (
+    GROUPINGS, SectorAggregates, fetch_classifications, read_sector_file, save_classifications, unclassified
+)
+from shared_state import LeaderLease, create_backend
+from stream import QuoteBroadcaster, compact_quote
+from ticker_extractor import TickerExtractor
+from twitter_client import TWITTER_API_BASE, TwitterClient
+from twitter_ingest import (
+    fetch_timelines, parse_tweet_time, record_mentions, stage_new_tweets, timeline_requests, upsert_ai_picks
 )
-logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+# Configure logging; LOG_FORMAT=json emits one JSON object per line
+configure_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    structured=os.getenv('LOG_FORMAT', 'text') == 'json',
+    sample_rate=float(os.getenv('LOG_SAMPLE_RATE', 1))
+)
+logger = logging.getLogger(__name__)
+
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)  # Allow all origins by default
+CORS(app, expose_headers=['X-Next-Cursor', 'Link', 'ETag'])  # Allow all origins by default
 
 # Configure the database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///trader.db'  # SQLite for simplicity
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///trader.db')  # SQLite for simplicity
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+db.init_app(app)
 
 # Twitter API Configuration
-TWITTER_API_BASE = 'https://api.twitter.com/2'
 BEARER_TOKEN = os.getenv('TWITTER_BEARER_TOKEN')
-HEADERS = {
-    'Authorization': f'Bearer {BEARER_TOKEN}',
-    'Content-Type': 'application/json'
+
+logger.info(f"Twitter bearer token configured: {bool(BEARER_TOKEN)}")
+
+RATE_LIMIT_TWEETS = 100  # Tweets per timeline page (API max)
+TWITTER_MAX_PAGES = int(os.getenv('TWITTER_MAX_PAGES', 10))  # Pages per account per refresh
+# Timelines are fetched concurrently; the per-endpoint token buckets keep us
+# inside the API budget, so there is no longer a cap on followed accounts
+TWITTER_MAX_WORKERS = int(os.getenv('TWITTER_MAX_WORKERS', 4))
+TWITTER_USERS_RATE_LIMIT = int(os.getenv('TWITTER_USERS_RATE_LIMIT', 300))  # per 15 minutes
+TWITTER_TWEETS_RATE_LIMIT = int(os.getenv('TWITTER_TWEETS_RATE_LIMIT', 1500))  # per 15 minutes
+TWITTER_HTTP_POOL_SIZE = int(os.getenv('TWITTER_HTTP_POOL_SIZE', 10))  # Keep-alive connections
+TWITTER_HTTP_TIMEOUT = float(os.getenv('TWITTER_HTTP_TIMEOUT', 10))  # Read timeout, seconds
+
+# Listed symbols used to validate cashtags; not shipped, download ticker_extractor.LISTING_URL here
+SYMBOL_LISTING_FILE = os.getenv(
+    'SYMBOL_LISTING_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symbols.txt')
+)
+ticker_extractor = TickerExtractor.from_listing(SYMBOL_LISTING_FILE)
+
+# Upstream health: fail fast while a service is down, skip symbols that keep failing
+TICKER_BAD_TTL = int(os.getenv('TICKER_BAD_TTL', 3600 * 6))
+TICKER_RETRY_AFTER = int(os.getenv('TICKER_RETRY_AFTER', 300))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = int(os.getenv('BREAKER_RESET_TIMEOUT', 60))
+
+ticker_health = TickerHealth(bad_ttl=TICKER_BAD_TTL, retry_after=TICKER_RETRY_AFTER)
+breakers = {
+    name: CircuitBreaker(name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT)
+    for name in ('yfinance', 'twitter')
 }
 
-print("Twitter API Configuration:")
-print(f"Bearer token exists: {bool(BEARER_TOKEN)}")
-print(f"Bearer token prefix: {BEARER_TOKEN[:20]}..." if BEARER_TOKEN else "No token found")
-
-# Cache configuration
-CACHE_DURATION = 3600 * 4  # Cache for 4 hours instead of 1
-last_twitter_fetch = 0
-RATE_LIMIT_TWEETS = 25  # Reduced from 50 to 25 tweets per user
-MAX_USERS_PER_FETCH = 3  # Reduced from 5 to 3 users per update to stay within rate limits
-
-# Database Models
-class StockPick(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    ticker = db.Column(db.String(10), nullable=False)
-    source = db.Column(db.String(10), nullable=False)  # AI or Manual
-    date = db.Column(db.Date, default=datetime.utcnow)
-    mention_count = db.Column(db.Integer, default=1)
-    twitter_users = db.Column(db.String(500))  # Comma-separated list of users who mentioned the stock
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
-    position_type = db.Column(db.String(10))  # long or short, only for manual picks
-
-class Position(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    ticker = db.Column(db.String(10), nullable=False)
-    entry_price = db.Column(db.Float, nullable=False)
-    exit_price = db.Column(db.Float, nullable=True)  # Null if not exited
-    status = db.Column(db.String(10), nullable=False)  # long, short, or closed
-    performance = db.Column(db.Float, nullable=True)  # Percentage gain/loss
-    
-class TradeHistory(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    ticker = db.Column(db.String(10), nullable=False)
-    entry_price = db.Column(db.Float, nullable=False)
-    exit_price = db.Column(db.Float, nullable=False)
-    performance = db.Column(db.Float, nullable=False)
-    date_closed = db.Column(db.Date, default=datetime.utcnow)
+twitter_client = TwitterClient(
+    BEARER_TOKEN,
+    users_limit=TWITTER_USERS_RATE_LIMIT,
+    tweets_limit=TWITTER_TWEETS_RATE_LIMIT,
+    api_base=os.getenv('TWITTER_API_BASE', TWITTER_API_BASE),
+    breaker=breakers['twitter'],
+    pool_size=max(TWITTER_HTTP_POOL_SIZE, TWITTER_MAX_WORKERS),
+    timeout=(3.05, TWITTER_HTTP_TIMEOUT)
+)
+
+# Multi-worker deployments: the refresh leader and watchlists live in a shared
+# backend (memory for a single process, sqlite for workers on one host, redis)
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+STATE_REDIS_URL = os.getenv('STATE_REDIS_URL', 'redis://localhost:6379/0')
+LEADER_LEASE_TTL = int(os.getenv('LEADER_LEASE_TTL', 60))  # Seconds
+
+# Quote cache configuration (seconds), shared by every route that needs prices
+QUOTE_TTL_MARKET_HOURS = int(os.getenv('QUOTE_TTL_MARKET_HOURS', 60))
+QUOTE_TTL_AFTER_HOURS = int(os.getenv('QUOTE_TTL_AFTER_HOURS', 900))
+QUOTE_CACHE_SIZE = int(os.getenv('QUOTE_CACHE_SIZE', 1000))
+
+# Background refresh intervals (seconds); handlers only read the snapshots
+QUOTE_REFRESH_INTERVAL = int(os.getenv('QUOTE_REFRESH_INTERVAL', 30))
+TWITTER_REFRESH_INTERVAL = int(os.getenv('TWITTER_REFRESH_INTERVAL', 300))
+STREAM_HEARTBEAT = int(os.getenv('STREAM_HEARTBEAT', 15))  # Seconds between SSE keep-alives
+HISTORY_REFRESH_INTERVAL = int(os.getenv('HISTORY_REFRESH_INTERVAL', 3600))
+
+# Daily OHLCV history kept on disk and topped up incrementally
+PRICE_STORE_DIR = os.getenv(
+    'PRICE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prices')
+)
+price_store = PriceStore(PRICE_STORE_DIR)
+
+# Sector classification: seeded from ticker,sector,industry,shares_outstanding
+# rows, and looked up from yfinance for other tracked tickers a few at a time
+SECTOR_FILE = os.getenv(
+    'SECTOR_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sectors.csv')
+)
+SECTOR_REFRESH_INTERVAL = int(os.getenv('SECTOR_REFRESH_INTERVAL', 600))
+SECTOR_LOOKUPS_PER_RUN = int(os.getenv('SECTOR_LOOKUPS_PER_RUN', 25))
+sector_aggregates = SectorAggregates()
+
+quote_cache = QuoteCache(
+    max_size=QUOTE_CACHE_SIZE,
+    market_ttl=QUOTE_TTL_MARKET_HOURS,
+    closed_ttl=QUOTE_TTL_AFTER_HOURS
+)
 
 def init_db():
     with app.app_context():
-        # Drop all tables
-        db.drop_all()
-        # Create all tables
-        db.create_all()
-        print("Database initialized!")
+        configure_sqlite(db.engine)
+        # Keep existing data and only apply pending schema migrations
+        migrate(db.engine)
+        # Per-request statement counts and time for /metrics
+        install_query_metrics(db.engine)
+        logger.info(f"Database ready (schema version {LATEST_VERSION})")
+
+def load_quote_snapshots(since=0):
+    # Persisted quotes fetched after `since`, as {ticker: (quote, fetched_at)}
+    return {
+        s.ticker: ({
+            'current_price': s.current_price,
+            'daily_change': s.daily_change,
+            'last_close': s.last_close
+        }, s.fetched_at)
+        for s in QuoteSnapshot.query.filter(QuoteSnapshot.fetched_at > since)
+    }
+
+def warm_start():
+    # Serve the last persisted quotes right away; the background refresher
+    # replaces them as they go stale
+    with app.app_context():
+        entries = load_quote_snapshots()
+    quote_cache.prime(entries)
+    logger.info(f"Warm start: loaded {len(entries)} persisted quotes")
 
 # Initialize the database
 init_db()
+# Analytics are memoized until a trade, position or pick is written
+analytics_memo.install(db.session)
+
+with app.app_context():
+    shared_state = create_backend(STATE_BACKEND, engine=db.engine, url=STATE_REDIS_URL)
+# Other workers' writes to those tables invalidate this worker's memo too
+analytics_memo.share(shared_state)
+warm_start()
+
+with app.app_context():
+    save_classifications(read_sector_file(SECTOR_FILE))
+
+def extract_stock_symbols(text):
+    # Unique, validated cashtags in the tweet ($AAPL, $aapl, $BRK.B -> BRK-B)
+    return ticker_extractor.extract(text)
 
-def should_fetch_twitter():
-    global last_twitter_fetch
-    current_time = time.time()
-    if current_time - last_twitter_fetch >= CACHE_DURATION:
-        last_twitter_fetch = current_time
-        return True
-    return False
-
-def get_user_id(username, retries=3):
-    print(f"\nAPI Request Details for {username}:")
-    print(f"URL: {TWITTER_API_BASE}/users/by/username/{username}")
-    print(f"Headers: {HEADERS}")
+def twitter_accounts_due():
+    # Followed accounts to fetch. The job runs every TWITTER_REFRESH_INTERVAL
+    # on the refresh leader only, and since_id keeps each run incremental
+    logger.info("Fetching fresh Twitter data...")
+    followed_accounts = os.getenv('TWITTER_FOLLOWED_ACCOUNTS', '').split(',')
+    followed_accounts = [acc.strip() for acc in followed_accounts if acc.strip()]
+    logger.info(f"Checking accounts: {followed_accounts}")
     
-    for attempt in range(retries):
-        try:
-            print(f"Attempting to get user ID for {username} (attempt {attempt + 1}/{retries})")
-            response = requests.get(
-                f'{TWITTER_API_BASE}/users/by/username/{username}',
-                headers=HEADERS
-            )
-            
-            remaining = response.headers.get('x-rate-limit-remaining', '0')
-            reset_time = response.headers.get('x-rate-limit-reset', '0')
-            print(f"Rate limit remaining: {remaining}, Reset time: {reset_time}")
-            
-            if response.status_code == 200:
-                user_data = response.json()
-                if 'data' in user_data:
-                    print(f"Successfully found user ID for {username}")
-                    return user_data['data']['id']
-                else:
-                    print(f"No user data found for {username}")
-                    return None
-            elif response.status_code == 429:
-                reset_time = int(response.headers.get('x-rate-limit-reset', 900))
-                current_time = int(time.time())
-                wait_time = max(reset_time - current_time, 60)
-                print(f"Rate limited, waiting {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print(f"Error getting user ID for {username}: {response.status_code}")
-                print(f"Response: {response.text}")
-                if attempt < retries - 1:
-                    sleep_time = 2 ** attempt
-                    print(f"Retrying in {sleep_time} seconds...")
-                    time.sleep(sleep_time)
-        except Exception as e:
-            print(f"Exception getting user ID for {username}: {str(e)}")
-            if attempt < retries - 1:
-                sleep_time = 2 ** attempt
-                print(f"Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
-            else:
-                return None
-    return None
-
-def get_user_tweets(user_id, retries=3):
+    if not followed_accounts:
+        logger.warning("No accounts configured in TWITTER_FOLLOWED_ACCOUNTS")
+    return followed_accounts
+
+def twitter_params():
+    # Accounts seen before only fetch tweets newer than their watermark;
+    # new accounts start from the last 24 hours
     yesterday = (datetime.now(UTC) - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
-    params = {
+    return {
         'max_results': RATE_LIMIT_TWEETS,
         'start_time': yesterday,
         'tweet.fields': 'created_at,text'
     }
-    
-    for attempt in range(retries):
-        try:
-            logger.info(f"Attempting to get tweets (attempt {attempt + 1}/{retries})")
-            response = requests.get(
-                f'{TWITTER_API_BASE}/users/{user_id}/tweets',
-                headers=HEADERS,
-                params=params
-            )
-            
-            remaining = response.headers.get('x-rate-limit-remaining', '0')
-            reset_time = response.headers.get('x-rate-limit-reset', '0')
-            print(f"Rate limit remaining: {remaining}, Reset time: {reset_time}")
-            
-            if response.status_code == 200:
-                data = response.json().get('data', [])
-                print(f"Found {len(data)} tweets")
-                return data
-            elif response.status_code == 429:
-                reset_time = int(response.headers.get('x-rate-limit-reset', 900))
-                current_time = int(time.time())
-                wait_time = max(reset_time - current_time, 60)
-                print(f"Rate limited, waiting {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print(f"Error getting tweets: {response.status_code}")
-                print(f"Response: {response.text}")
-                if attempt < retries - 1:
-                    sleep_time = 2 ** attempt
-                    print(f"Retrying in {sleep_time} seconds...")
-                    time.sleep(sleep_time)
-        except Exception as e:
-            print(f"Exception getting tweets: {str(e)}")
-            if attempt < retries - 1:
-                sleep_time = 2 ** attempt
-                print(f"Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
-            else:
-                return []
-    return []
-
-def extract_stock_symbols(text):
-    # Match stock symbols that start with $ and are followed by 1-5 capital letters
-    pattern = r'\$([A-Z]{1,5})'
-    matches = re.findall(pattern, text)
-    return matches
 
 def fetch_twitter_stocks():
-    if not should_fetch_twitter():
-        logger.info("Using cached data (less than 4 hours old)")
-        return
-        
-    logger.info("Fetching fresh Twitter data...")
-    followed_accounts = os.getenv('TWITTER_FOLLOWED_ACCOUNTS', '').split(',')
-    followed_accounts = [acc.strip() for acc in followed_accounts if acc.strip()]
-    print(f"Checking accounts: {followed_accounts}")
-    
+    followed_accounts = twitter_accounts_due()
     if not followed_accounts:
-        print("No accounts configured in TWITTER_FOLLOWED_ACCOUNTS")
         return
-        
-    # Limit the number of accounts to fetch from
-    followed_accounts = followed_accounts[:MAX_USERS_PER_FETCH]
+    timelines = fetch_timelines(
+        twitter_client,
+        timeline_requests(twitter_client, followed_accounts),
+        twitter_params(),
+        max_workers=TWITTER_MAX_WORKERS,
+        max_pages=TWITTER_MAX_PAGES
+    )
+    save_twitter_timelines(followed_accounts, timelines)
+
+def save_twitter_timelines(followed_accounts, timelines):
+    # Shared by the threaded job and the async job in asgi.py
+    timelines = stage_new_tweets(timelines)
+    missing = [acc for acc in followed_accounts if acc not in timelines]
+    if missing:
+        logger.warning(f"Could not find user IDs for {missing}")
     
+    update_time = datetime.now(UTC)
     stock_mentions = Counter()
-    user_mentions = {}
+    # Picks are dated by the tweet's UTC day, the same day its Mention rows
+    # are grouped on, so a pick's users and mention count always agree
+    daily_mentions = Counter()
+    mention_rows = []
     
-    for username in followed_accounts:
-        try:
-            print(f"\nProcessing tweets from @{username}")
-            user_id = get_user_id(username)
-            if not user_id:
-                print(f"Could not find user ID for {username}")
-                continue
-                
-            tweets = get_user_tweets(user_id)
-            for tweet in tweets:
-                stocks = extract_stock_symbols(tweet['text'])
-                if stocks:
-                    print(f"Found stocks in tweet: {stocks}")
-                    print(f"Tweet text: {tweet['text']}")
-                for stock in stocks:
-                    stock_mentions[stock] += 1
-                    if stock not in user_mentions:
-                        user_mentions[stock] = set()
-                    user_mentions[stock].add(username)
-                    
-        except Exception as e:
-            print(f"Error fetching tweets for {username}: {str(e)}")
-            continue
+    for username, tweets in timelines.items():
+        logger.info(
+            f"Found {len(tweets)} new tweets from @{username}",
+            extra=dict(SAMPLED, account=username, tweets=len(tweets))
+        )
+        TWEETS_SCANNED.inc(len(tweets))
+        symbol_lists = ticker_extractor.extract_batch([tweet['text'] for tweet in tweets])
+        for tweet, stocks in zip(tweets, symbol_lists):
+            created_at = parse_tweet_time(tweet.get('created_at')) or update_time.replace(tzinfo=None)
+            for stock in stocks:
+                stock_mentions[stock] += 1
+                daily_mentions[stock, created_at.date()] += 1
+                mention_rows.append({
+                    'ticker': stock,
+                    'username': username,
+                    'tweet_id': tweet['id'],
+                    'created_at': created_at
+                })
     
     if not stock_mentions:
-        print("No stock mentions found in the last 24 hours")
+        logger.info("No new stock mentions found")
+        # Still persist the processed tweets and advanced watermarks
+        db.session.commit()
         return
         
-    print("\nStock mentions found:", dict(stock_mentions))
+    TICKERS_EXTRACTED.inc(len(mention_rows))
+    logger.info(f"Stock mentions found: {dict(stock_mentions)}", extra={'mentions': len(mention_rows)})
     
     # Update database with new mentions
-    update_time = datetime.now(UTC)
-    
-    for stock, count in stock_mentions.items():
-        users = ','.join(user_mentions[stock])
-        existing = StockPick.query.filter_by(
-            ticker=stock,
-            source='AI',
-            date=update_time.date()
-        ).first()
-        
-        if existing:
-            existing.mention_count += count
-            existing.twitter_users = users
-            existing.last_updated = update_time
-        else:
-            new_pick = StockPick(
-                ticker=stock,
-                source='AI',
-                mention_count=count,
-                twitter_users=users,
-                last_updated=update_time
-            )
-            db.session.add(new_pick)
+    record_mentions(mention_rows)
+    upsert_ai_picks(daily_mentions, update_time)
     
     db.session.commit()
-    print("Database updated successfully")
+    logger.info("Database updated successfully")
 
 def get_stock_data(tickers):
-    stock_data = {}
-    try:
-        # Process tickers in smaller batches
-        batch_size = 2
-        for i in range(0, len(tickers), batch_size):
-            batch = tickers[i:i + batch_size]
-            
-            for ticker in batch:
-                retries = 3
-                delay = 2
-                success = False
-                
-                for attempt in range(retries):
-                    try:
-                        # Create ticker without custom session, let yfinance handle it
-                        stock = yf.Ticker(ticker)
-                        
-                        # First try to get fast_info data (most reliable and efficient)
-                        try:
-                            fast_info = stock.fast_info
-                            current_price = fast_info['lastPrice']
-                            last_close = fast_info['previousClose']
-                            price_change = ((current_price - last_close) / last_close) * 100
-                            
-                            stock_data[ticker] = {
-                                'current_price': current_price,
-                                'daily_change': price_change,
-                                'last_close': last_close
-                            }
-                            success = True
-                            break
-                            
-                        except Exception as e:
-                            logger.warning(f"Fast info failed for {ticker}, trying history: {str(e)}")
-                            # If fast_info fails, try historical data
-                            hist = stock.history(period='2d', interval='1d', prepost=False)
-                            if len(hist) >= 1:
-                                current_or_last = float(hist['Close'].iloc[-1])
-                                price_change = 0
-                                
-                                if len(hist) >= 2:
-                                    yesterday_close = float(hist['Close'].iloc[-2])
-                                    price_change = ((current_or_last - yesterday_close) / yesterday_close) * 100
-                                
-                                stock_data[ticker] = {
-                                    'current_price': current_or_last,
-                                    'daily_change': price_change,
-                                    'last_close': current_or_last
-                                }
-                                success = True
-                                break
-                            
-                    except Exception as e:
-                        error_msg = str(e).lower()
-                        logger.error(f"Error fetching data for {ticker} (attempt {attempt + 1}): {str(e)}")
-                        
-                        if any(x in error_msg for x in ['too many requests', '429', 'rate limit']):
-                            sleep_time = delay * (2 ** attempt)
-                            logger.info(f"Rate limited, waiting {sleep_time} seconds...")
-                            time.sleep(sleep_time)
-                        elif any(x in error_msg for x in ['not found', 'delisted', 'no data']):
-                            logger.warning(f"Invalid symbol {ticker}")
-                            break
-                        else:
-                            time.sleep(2)
-                
-                if not success:
-                    logger.error(f"Failed to fetch data for {ticker} after {retries} attempts")
-                    stock_data[ticker] = {
-                        'current_price': None,
-                        'daily_change': None,
-                        'last_close': None
-                    }
-            
-            # Add delay between batches to avoid rate limits
-            time.sleep(2)
-            
-    except Exception as e:
-        logger.error(f"Global error in get_stock_data: {str(e)}")
-            
-    return stock_data
+    # Serve fresh quotes from the shared cache and only go upstream for misses
+    return quote_cache.get_many(tickers, fetch_stock_data)
+
+def fetch_stock_data(tickers):
+    # Stored history supplies previous closes, so only the latest bar is downloaded
+    return fetch_quotes(
+        list(tickers),
+        price_store=price_store,
+        health=ticker_health,
+        breaker=breakers['yfinance']
+    )
+
+# Background market-data refresh
+watchlist = Watchlist()
+# Only the worker holding the lease talks to yfinance and Twitter
+leader = LeaderLease(shared_state, ttl=LEADER_LEASE_TTL)
+refresher = BackgroundRefresher(app, leader=leader)
+broadcaster = QuoteBroadcaster()
+
+def tracked_tickers():
+    tickers = {t for (t,) in db.session.query(StockPick.ticker).distinct()}
+    tickers.update(t for (t,) in db.session.query(Position.ticker).distinct())
+    tickers.update(watchlist.tickers())
+    # Every classified ticker feeds the sector aggregates
+    tickers.update(sector_aggregates.tickers())
+    # Tickers requested from the other workers' dashboards
+    for watched in shared_state.scan('watchlist:').values():
+        tickers.update(json.loads(watched))
+    return sorted(tickers)
+
+last_snapshot_save = 0
+
+def save_quote_snapshot():
+    # Persist quotes fetched since the last save so a restart can warm-start
+    global last_snapshot_save
+    entries = quote_cache.entries_since(last_snapshot_save)
+    if not entries:
+        return
+    rows = [{
+        'ticker': ticker,
+        'current_price': quote.get('current_price'),
+        'daily_change': quote.get('daily_change'),
+        'last_close': quote.get('last_close'),
+        'fetched_at': fetched_at
+    } for ticker, (quote, fetched_at) in entries.items()]
+    stmt = sqlite_insert(QuoteSnapshot).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['ticker'],
+        set_={
+            'current_price': stmt.excluded.current_price,
+            'daily_change': stmt.excluded.daily_change,
+            'last_close': stmt.excluded.last_close,
+            'fetched_at': stmt.excluded.fetched_at
+        }
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+    last_snapshot_save = max(row['fetched_at'] for row in rows)
+
+def update_sector_aggregates():
+    sector_aggregates.reload()
+    sector_aggregates.update(quote_cache.snapshot(sector_aggregates.tickers()))
+
+def refresh_quotes():
+    # Pick up newly classified tickers before deciding what to refresh
+    sector_aggregates.reload()
+    tickers = tracked_tickers()
+    if len(tickers) > quote_cache.max_size:
+        logger.warning(
+            f"Tracking {len(tickers)} tickers but QUOTE_CACHE_SIZE is {quote_cache.max_size}; "
+            "quotes will be evicted before they are served"
+        )
+    if tickers:
+        # Only entries older than the cache TTL go upstream
+        get_stock_data(tickers)
+        save_quote_snapshot()
+        # One refresh, fanned out to every connected /stream client
+        broadcaster.publish(quote_cache.snapshot(tickers))
+    update_sector_aggregates()
+
+last_snapshot_sync = 0
+
+def sync_quotes():
+    # Followers serve the quotes the leader persisted, and hand it the
+    # tickers their own clients asked for
+    global last_snapshot_sync
+    shared_state.set(
+        f'watchlist:{leader.owner}', json.dumps(watchlist.tickers()), ttl=QUOTE_REFRESH_INTERVAL * 3
+    )
+    entries = load_quote_snapshots(last_snapshot_sync)
+    if entries:
+        quote_cache.prime(entries)
+        last_snapshot_sync = max(fetched_at for _, fetched_at in entries.values())
+        broadcaster.publish(quote_cache.snapshot(list(entries)))
+    update_sector_aggregates()
+
+refresher.add_job('quotes', QUOTE_REFRESH_INTERVAL, refresh_quotes, follower=sync_quotes)
+refresher.add_job('twitter', TWITTER_REFRESH_INTERVAL, fetch_twitter_stocks)
+
+def refresh_history():
+    tickers, _ = ticker_health.partition(tracked_tickers())
+    if tickers:
+        added = price_store.top_up(tickers, breaker=breakers['yfinance'])
+        if any(added.values()):
+            bars = sum(added.values())
+            updated = sum(1 for n in added.values() if n)
+            logger.info(
+                f"Stored {bars} new daily bars for {updated} tickers",
+                extra=dict(SAMPLED, bars=bars, tickers=updated)
+            )
+
+refresher.add_job('history', HISTORY_REFRESH_INTERVAL, refresh_history)
+
+def classify_sectors():
+    tickers, _ = ticker_health.partition(unclassified(tracked_tickers()))
+    rows = fetch_classifications(
+        tickers[:SECTOR_LOOKUPS_PER_RUN], breaker=breakers['yfinance'], health=ticker_health
+    )
+    save_classifications(rows)
+    if rows:
+        logger.info(f"Classified {len(rows)} tickers by sector, {max(len(tickers) - len(rows), 0)} left")
+
+refresher.add_job('sectors', SECTOR_REFRESH_INTERVAL, classify_sectors)
+
+def quote_snapshot(tickers):
+    # Never performs network I/O: tickers without a quote yet are added to the
+    # watchlist and picked up by the next background refresh
+    snapshot = quote_cache.snapshot(tickers)
+    added = watchlist.touch(tickers)
+    if any(t not in snapshot for t in added):
+        refresher.trigger('quotes')
+    return snapshot
+
+def start_background_jobs():
+    refresher.start()
+
+# Scrape-time views of state other components already keep
+def _cache_requests():
+    stats = quote_cache.stats()
+    return {(result,): stats[result] for result in ('hits', 'misses', 'coalesced')}
+
+CallbackGauge('quote_cache_hit_ratio', 'Share of quote lookups served from the cache',
+              lambda: quote_cache.stats()['hit_ratio'])
+CallbackGauge('quote_cache_requests_total', 'Quote cache lookups by result',
+              _cache_requests, ['result'], kind='counter')
+CallbackGauge('analytics_memo_hits_total', 'Analytics results served from the memo',
+              lambda: analytics_memo.hits, kind='counter')
+CallbackGauge('analytics_memo_misses_total', 'Analytics results computed from the database',
+              lambda: analytics_memo.misses, kind='counter')
+CallbackGauge('twitter_rate_limit_wait_seconds_total', 'Time spent waiting for Twitter rate-limit tokens',
+              lambda: {(name,): bucket.waited for name, bucket in twitter_client.buckets.items()},
+              ['endpoint'], kind='counter')
+CallbackGauge('twitter_rate_limit_remaining', 'Requests left in the current Twitter rate-limit window',
+              lambda: {(name,): bucket.status()['remaining'] for name, bucket in twitter_client.buckets.items()},
+              ['endpoint'])
+CallbackGauge('circuit_breaker_open', '1 while an upstream circuit breaker is open or half-open',
+              lambda: {(name,): int(breaker.state != 'closed') for name, breaker in breakers.items()},
+              ['upstream'])
+CallbackGauge('stream_clients', 'Connected /stream clients', broadcaster.client_count)
+
+# Fields each list endpoint can return (?fields=), and the ones that need quotes
+PICK_FIELDS = [
+    'id', 'ticker', 'source', 'date', 'mention_count', 'twitter_users',
+    'last_updated', 'position_type', 'current_price', 'daily_change', 'as_of'
+]
+POSITION_FIELDS = [
+    'id', 'ticker', 'entry_price', 'exit_price', 'current_price',
+    'daily_change', 'as_of', 'status', 'performance'
+]
+TRADE_FIELDS = ['id', 'ticker', 'entry_price', 'exit_price', 'performance', 'date_closed']
+QUOTE_FIELDS = {'current_price', 'daily_change', 'as_of'}
+
+# Sortable columns (?sort=name or ?sort=-name) and how to parse cursor values
+PICK_SORTS = {
+    'id': (StockPick.id, int),
+    'date': (StockPick.date, parse_date),
+    'ticker': (StockPick.ticker, str),
+    'mention_count': (StockPick.mention_count, int)
+}
+POSITION_SORTS = {
+    'id': (Position.id, int),
+    'ticker': (Position.ticker, str),
+    'entry_price': (Position.entry_price, float)
+}
+TRADE_SORTS = {
+    'id': (TradeHistory.id, int),
+    'date_closed': (TradeHistory.date_closed, parse_date),
+    'ticker': (TradeHistory.ticker, str),
+    'performance': (TradeHistory.performance, float)
+}
+
+@app.errorhandler(ListingError)
+def listing_error(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.errorhandler(ImportFormatError)
+def import_format_error(e):
+    return jsonify({'error': str(e)}), 415
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    begin_query_scope()
+
+@app.after_request
+def record_request_metrics(response):
+    # Label by URL rule, not path, so /picks/<int:pick_id> is one series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.pop('request_started', None)
+    if started is not None:
+        ROUTE_LATENCY.observe(
+            time.perf_counter() - started,
+            route=route, method=request.method, status=response.status_code
+        )
+    end_query_scope(route)
+    return response
 
 # Root Route
 @app.route('/')
 def home():
     return "Server is running!"
 
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(dict(quote_cache.stats(), stream_clients=broadcaster.client_count()))
+
+@app.route('/health')
+def upstream_health():
+    return jsonify({
+        'breakers': {name: breaker.status() for name, breaker in breakers.items()},
+        'leader': leader.status(),
+        'skipped_tickers': ticker_health.status(),
+        'symbol_listing': ticker_extractor.symbols is not None,
+        'twitter_endpoints': twitter_client.stats()
+    })
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs')
+def jobs_status():
+    return jsonify(refresher.status())
+
 # API Routes
 @app.route('/picks', methods=['GET', 'POST'])
 def handle_picks():
     if request.method == 'GET':
-        # Only fetch new Twitter data if cache has expired
-        fetch_twitter_stocks()
-        
-        # Get all picks
-        picks = StockPick.query.all()
+        window = request.args.get('window')
+        if window:
+            # Top N tickers over a trailing window, aggregated from Mention
+            if window not in MENTION_WINDOWS:
+                return jsonify({'error': f"window must be one of {', '.join(MENTION_WINDOWS)}"}), 400
+            limit = parse_limit(request.args, default=20, maximum=200)
+            top = top_mentioned(MENTION_WINDOWS[window], limit)
+            stock_data = quote_snapshot([row['ticker'] for row in top])
+            return list_response([dict(
+                row,
+                source='AI',
+                window=window,
+                current_price=stock_data.get(row['ticker'], {}).get('current_price'),
+                daily_change=stock_data.get(row['ticker'], {}).get('daily_change'),
+                as_of=stock_data.get(row['ticker'], {}).get('as_of')
+            ) for row in top], None)
+
+        fields = parse_fields(request.args, PICK_FIELDS)
+        query = filter_in(StockPick.query, StockPick.ticker, parse_csv(request.args.get('ticker')))
+        if request.args.get('source'):
+            query = query.filter(StockPick.source == request.args['source'])
+        query = filter_date_range(query, StockPick.date, request.args)
+        picks, next_cursor = keyset_page(query, StockPick, PICK_SORTS, '-date', request.args)
         
-        # Get unique tickers from picks
+        # Quotes only for the picks on this page, and only if asked for
         tickers = list(set(p.ticker for p in picks))
+        stock_data = quote_snapshot(tickers) if QUOTE_FIELDS.intersection(fields) else {}
+
+        # Users behind each AI pick, grouped per ticker and day in SQL
+        ai_picks = [p for p in picks if p.source == 'AI']
+        ai_users = users_by_ticker_day(
+            list(set(p.ticker for p in ai_picks)),
+            min(p.date for p in ai_picks),
+            max(p.date for p in ai_picks)
+        ) if ai_picks and 'twitter_users' in fields else {}
         
-        # Fetch stock data for all picks
-        stock_data = get_stock_data(tickers)
-        
-        return jsonify([{
+        return list_response([project({
             'id': p.id,
             'ticker': p.ticker,
             'source': p.source,
             'date': p.date.strftime('%Y-%m-%d'),
             'mention_count': p.mention_count,
-            'twitter_users': p.twitter_users.split(',') if p.twitter_users else [],
+            'twitter_users': ai_users.get((p.ticker, p.date), []) if p.source == 'AI' else (p.twitter_users.split(',') if p.twitter_users else []),
             'last_updated': p.last_updated.isoformat() if p.last_updated else None,
             'position_type': p.position_type,
             'current_price': stock_data.get(p.ticker, {}).get('current_price'),
-            'daily_change': stock_data.get(p.ticker, {}).get('daily_change')
-        } for p in picks])
+            'daily_change': stock_data.get(p.ticker, {}).get('daily_change'),
+            'as_of': stock_data.get(p.ticker, {}).get('as_of')
+        }, fields) for p in picks], next_cursor)
     
     if request.method == 'POST':
         data = request.json
+        duplicate = StockPick.query.filter_by(
+            ticker=data['ticker'],
+            source=data['source'],
+            date=datetime.utcnow().date()
+        ).first()
+        if duplicate:
+            return jsonify({'error': 'Stock pick already exists for today'}), 409
         new_pick = StockPick(
             ticker=data['ticker'],
             source=data['source'],
@@ -412,6 +601,14 @@ def handle_pick(pick_id):
     
     if request.method == 'PUT':
         data = request.json
+        duplicate = StockPick.query.filter(
+            StockPick.id != pick.id,
+            StockPick.ticker == data['ticker'],
+            StockPick.source == pick.source,
+            StockPick.date == pick.date
+        ).first()
+        if duplicate:
+            return jsonify({'error': 'Stock pick already exists for that day'}), 409
         pick.ticker = data['ticker']
         db.session.commit()
         return jsonify({'message': 'Stock pick updated successfully!'})
@@ -424,24 +621,26 @@ def handle_pick(pick_id):
 @app.route('/positions', methods=['GET', 'POST'])
 def handle_positions():
     if request.method == 'GET':
-        positions = Position.query.all()
+        fields = parse_fields(request.args, POSITION_FIELDS)
+        query = filter_in(Position.query, Position.ticker, parse_csv(request.args.get('ticker')))
+        query = filter_in(query, Position.status, parse_csv(request.args.get('status')))
+        positions, next_cursor = keyset_page(query, Position, POSITION_SORTS, 'id', request.args)
         
-        # Get unique tickers from positions
+        # Latest refreshed quotes, only for the positions on this page
         tickers = list(set(p.ticker for p in positions))
+        stock_data = quote_snapshot(tickers) if QUOTE_FIELDS.intersection(fields) else {}
         
-        # Fetch stock data
-        stock_data = get_stock_data(tickers)
-        
-        return jsonify([{
+        return list_response([project({
             'id': p.id,
             'ticker': p.ticker,
             'entry_price': p.entry_price,
             'exit_price': p.exit_price,
             'current_price': stock_data.get(p.ticker, {}).get('current_price'),
             'daily_change': stock_data.get(p.ticker, {}).get('daily_change'),
+            'as_of': stock_data.get(p.ticker, {}).get('as_of'),
             'status': p.status,
             'performance': p.performance
-        } for p in positions])
+        }, fields) for p in positions], next_cursor)
 
     if request.method == 'POST':
         data = request.json
@@ -451,10 +650,7 @@ def handle_positions():
         # Calculate performance if we have both prices
         performance = None
         if exit_price and entry_price:
-            if data['status'] == 'long':
-                performance = ((exit_price - entry_price) / entry_price) * 100
-            else:  # short position
-                performance = ((entry_price - exit_price) / entry_price) * 100
+            performance = calculate_performance(data['status'], entry_price, exit_price)
         
         # If we have an exit price, create a trade history entry
         if exit_price:
@@ -491,10 +687,7 @@ def update_position(position_id):
     if 'exit_price' in data:
         exit_price = float(data['exit_price'])
         # Calculate performance
-        if position.status == 'long':
-            performance = ((exit_price - position.entry_price) / position.entry_price) * 100
-        else:  # short position
-            performance = ((position.entry_price - exit_price) / position.entry_price) * 100
+        performance = calculate_performance(position.status, position.entry_price, exit_price)
             
         # Create trade history entry
         trade_history = TradeHistory(
@@ -521,33 +714,140 @@ def delete_position(position_id):
 
 @app.route('/trades', methods=['GET'])
 def get_trades():
-    trades = TradeHistory.query.all()
-    return jsonify([{
+    fields = parse_fields(request.args, TRADE_FIELDS)
+    query = filter_in(TradeHistory.query, TradeHistory.ticker, parse_csv(request.args.get('ticker')))
+    query = filter_date_range(query, TradeHistory.date_closed, request.args)
+    trades, next_cursor = keyset_page(query, TradeHistory, TRADE_SORTS, '-id', request.args)
+    return list_response([project({
         'id': t.id,
         'ticker': t.ticker,
         'entry_price': t.entry_price,
         'exit_price': t.exit_price,
         'performance': t.performance,
         'date_closed': t.date_closed.strftime('%Y-%m-%d')
-    } for t in trades])
+    }, fields) for t in trades], next_cursor)
+
+# Batch import and streaming export: model, record validator, date column for ?date_from/?date_to
+BULK_RESOURCES = {
+    'picks': (StockPick, validate_pick, StockPick.date),
+    'positions': (Position, validate_position, None),
+    'trades': (TradeHistory, validate_trade, TradeHistory.date_closed)
+}
+
+@app.route('/<any(picks, positions, trades):resource>/batch', methods=['POST'])
+def batch_import(resource):
+    _, validate, _ = BULK_RESOURCES[resource]
+    summary = import_records(read_records(request), validate)
+    # An upload with no valid record at all is a client error
+    status = 400 if summary['received'] and summary['invalid'] == summary['received'] else 200
+    return jsonify(summary), status
+
+@app.route('/<any(picks, positions, trades):resource>/export')
+def batch_export(resource):
+    model, _, date_column = BULK_RESOURCES[resource]
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_TYPES:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_TYPES)}"}), 400
+    where = []
+    tickers = parse_csv(request.args.get('ticker'))
+    if tickers:
+        where.append(model.ticker.in_(tickers))
+    if date_column is not None:
+        if request.args.get('date_from'):
+            where.append(date_column >= parse_date(request.args['date_from']))
+        if request.args.get('date_to'):
+            where.append(date_column <= parse_date(request.args['date_to']))
+    return Response(
+        stream_with_context(export_rows(model, fmt, where)),
+        mimetype=EXPORT_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename={resource}.{fmt}'}
+    )
+
+@app.route('/history/<ticker>')
+def get_history(ticker):
+    # Served from the local store only; unknown tickers are queued for the next top-up
+    ticker = ticker.upper()
+    start = parse_date(request.args['start']) if 'start' in request.args else None
+    end = parse_date(request.args['end']) if 'end' in request.args else None
+    bars = price_store.range(ticker, start, end)
+    if 'days' in request.args:
+        try:
+            days = int(request.args['days'])
+        except ValueError:
+            raise ListingError('days must be an integer')
+        bars = bars[-days:] if days > 0 else bars[:0]
+    if not len(price_store.read(ticker)):
+        watchlist.touch([ticker])
+
+    if request.args.get('closes') == 'true':
+        # Compact form for sparklines
+        return jsonify({'ticker': ticker, 'closes': bars['close'].tolist()})
+    return jsonify({'ticker': ticker, 'bars': [{
+        'date': str(bar['date']),
+        'open': float(bar['open']),
+        'high': float(bar['high']),
+        'low': float(bar['low']),
+        'close': float(bar['close']),
+        'volume': float(bar['volume'])
+    } for bar in bars]})
+
+@app.route('/analytics')
+def get_analytics():
+    # Open positions are marked against cached quotes, never fetched live
+    return jsonify(portfolio_analytics(quote_snapshot))
+
+@app.route('/stream')
+def stream_quotes():
+    # Server-sent events: a snapshot, then only the tickers whose price moved
+    tickers = parse_csv(request.args.get('tickers'))
+    subscription = broadcaster.subscribe(tickers)
+    initial = None
+    if tickers:
+        initial = {t: compact_quote(q) for t, q in quote_snapshot(tickers).items()}
+    return Response(
+        broadcaster.stream(
+            subscription,
+            initial=initial,
+            heartbeat=STREAM_HEARTBEAT,
+            # Keep the client's tickers on the refresher's watchlist while connected
+            on_heartbeat=lambda: watchlist.touch(tickers)
+        ),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/continue-iteration', methods=['POST'])
 def continue_iteration():
     try:
-        # For now, just fetch new Twitter data and update picks
-        fetch_twitter_stocks()
+        # Wake the background Twitter job instead of fetching on this thread
+        refresher.trigger('twitter')
         return jsonify({"message": "Iteration started successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/sectors')
 def get_sectors():
-    tickers = request.args.get('tickers', '').split(',')
-    if not tickers or not tickers[0]:
-        return jsonify({}), 400
-        
-    stock_data = get_stock_data(tickers)
-    return jsonify(stock_data)
+    tickers = parse_csv(request.args.get('tickers'))
+    if tickers:
+        # Quotes for the given tickers, e.g. sector ETFs
+        stock_data = quote_snapshot(tickers)
+        return jsonify({t: stock_data.get(t, dict(EMPTY_QUOTE, as_of=None)) for t in tickers})
+
+    # Aggregates precomputed by the quote refresh, served as stored
+    grouping = request.args.get('by', 'sector')
+    if grouping not in GROUPINGS:
+        return jsonify({'error': f"by must be one of {', '.join(GROUPINGS)}"}), 400
+    snapshot = sector_aggregates.snapshot(grouping)
+    if snapshot is None:
+        refresher.trigger('quotes')
+        return jsonify({'error': 'Sector aggregates are not computed yet'}), 503
+    body, etag = snapshot
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
+    # With the debug reloader only the serving child process runs the jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs()
     app.run(debug=True, port=5001)
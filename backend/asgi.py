@@ -0,0 +1,150 @@
+"""ASGI serving mode for deployments with many idle /stream clients.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+
+/stream is served natively on the event loop, so idle SSE clients don't
+each hold a thread. Background jobs run as tasks on the same loop: yfinance
+work goes through a bounded executor and Twitter timelines are fetched with
+a pooled async HTTP client. Several workers (uvicorn --workers N) need a
+shared state backend, STATE_BACKEND=sqlite or redis, so only the refresh
+leader runs the upstream jobs.
+
+The JSON routes are still the regular Flask views, bridged from the loop to
+a pool of ASGI_WSGI_WORKERS threads. That bridge costs more than it saves:
+in benchmarks/load_test.py this mode serves the JSON routes with lower
+throughput and a higher p99 than the threaded dev server. Use it only when
+the number of /stream connections, not JSON traffic, is the constraint.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import asyncio
+import functools
+import logging
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import (
+    STREAM_HEARTBEAT, TWITTER_MAX_PAGES, TWITTER_MAX_WORKERS,
+    app as flask_app, broadcaster, quote_snapshot, refresher, save_twitter_timelines,
+    twitter_accounts_due, twitter_client, twitter_params, watchlist
+)
+from listing import parse_csv
+from stream import compact_quote
+from twitter_client import AsyncTwitterClient
+from twitter_ingest import fetch_timelines_async, timeline_requests
+
+logger = logging.getLogger(__name__)
+
+# Threads serving the Flask views, and threads allowed to block on yfinance/DB work
+WSGI_WORKERS = int(os.getenv('ASGI_WSGI_WORKERS', 16))
+UPSTREAM_WORKERS = int(os.getenv('ASGI_UPSTREAM_WORKERS', 4))
+
+wsgi = WSGIMiddleware(flask_app, workers=WSGI_WORKERS)
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix='upstream')
+# Same pool size and timeouts as the sync client it wraps
+async_twitter = AsyncTwitterClient(twitter_client)
+
+
+def _in_app_context(func, *args):
+    with flask_app.app_context():
+        return func(*args)
+
+
+async def run_blocking(func, *args):
+    # Database and yfinance work, kept off the event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(upstream_executor, functools.partial(_in_app_context, func, *args))
+
+
+async def fetch_twitter_stocks_async():
+    followed_accounts = await run_blocking(twitter_accounts_due)
+    if not followed_accounts:
+        return
+    # Usernames are only looked up the first time; that stays on the sync client
+    accounts = await run_blocking(timeline_requests, twitter_client, followed_accounts)
+    timelines = await fetch_timelines_async(
+        async_twitter,
+        accounts,
+        twitter_params(),
+        concurrency=TWITTER_MAX_WORKERS,
+        max_pages=TWITTER_MAX_PAGES
+    )
+    await run_blocking(save_twitter_timelines, followed_accounts, timelines)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_quotes(scope, receive, send):
+    # Same protocol as the Flask /stream route, without a thread per client
+    query = parse_qs(scope['query_string'].decode())
+    tickers = parse_csv(query.get('tickers', [''])[0])
+    subscription = broadcaster.subscribe(tickers, loop=asyncio.get_running_loop())
+    initial = None
+    if tickers:
+        initial = {t: compact_quote(q) for t, q in quote_snapshot(tickers).items()}
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    frames = broadcaster.stream_async(
+        subscription,
+        initial=initial,
+        heartbeat=STREAM_HEARTBEAT,
+        on_heartbeat=lambda: watchlist.touch(tickers)
+    )
+    disconnected = asyncio.create_task(_wait_for_disconnect(receive))
+    try:
+        async for frame in frames:
+            if disconnected.done():
+                break
+            await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+    finally:
+        disconnected.cancel()
+        await frames.aclose()
+
+
+async def lifespan(receive, send):
+    jobs = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            jobs = asyncio.create_task(
+                refresher.run_async(upstream_executor, {'twitter': fetch_twitter_stocks_async})
+            )
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            refresher.stop()
+            if jobs is not None:
+                try:
+                    await asyncio.wait_for(jobs, timeout=10)
+                except asyncio.TimeoutError:
+                    logger.warning("Background jobs did not stop within 10 seconds")
+            await async_twitter.aclose()
+            upstream_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/stream' and scope['method'] == 'GET':
+        await stream_quotes(scope, receive, send)
+    else:
+        await wsgi(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host=os.getenv('HOST', '127.0.0.1'), port=int(os.getenv('PORT', 5001)))
@@ -0,0 +1,153 @@
+"""Backtest Twitter-mention signals against the local price-history store.
+
+Each stored AI pick (ticker, date, mention_count, distinct users) is an
+entry signal. A position is opened at the next session's open after the
+signal date and closed at the close `hold` sessions later, and scored with
+the same formula as closed positions in the app. Runs offline:
+
+    python backtest.py --db instance/trader.db --prices data/prices \\
+        --thresholds 1,2,3,5 --min-users 1,2 --holds 1,3,5,10 --workers 4
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, func, select
+
+from analytics import calculate_performance
+from models import Mention, StockPick
+from price_store import PriceStore
+
+DIRECTIONS = ('long', 'short')
+
+
+def load_signals(engine):
+    """AI picks with the number of distinct users who mentioned the ticker that day."""
+    picks = StockPick.__table__
+    mentions = Mention.__table__
+    day = func.date(mentions.c.created_at)
+    users = (
+        select(mentions.c.ticker, day.label('day'), func.count(mentions.c.username.distinct()).label('user_count'))
+        .group_by(mentions.c.ticker, day)
+        .subquery()
+    )
+    query = (
+        select(picks.c.ticker, picks.c.date, picks.c.mention_count, func.coalesce(users.c.user_count, 0))
+        .select_from(picks.outerjoin(users, (users.c.ticker == picks.c.ticker) & (users.c.day == picks.c.date)))
+        .where(picks.c.source == 'AI')
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+    return pd.DataFrame.from_records(rows, columns=['ticker', 'date', 'mention_count', 'user_count'])
+
+
+def entry_exit_prices(store, signals, hold):
+    """Entry (next open) and exit (close `hold` sessions later) for every signal.
+
+    NaN where the price history doesn't cover the trade yet.
+    """
+    entry = np.full(len(signals), np.nan)
+    exit_ = np.full(len(signals), np.nan)
+    dates = signals['date'].to_numpy(dtype='datetime64[D]')
+    for ticker, index in signals.groupby('ticker').indices.items():
+        bars = store.read(ticker)
+        if not len(bars):
+            continue
+        # First session strictly after the signal day: no look-ahead
+        entry_idx = np.searchsorted(bars['date'], dates[index], side='right')
+        exit_idx = entry_idx + hold - 1
+        valid = exit_idx < len(bars)
+        entry[index[valid]] = bars['open'][entry_idx[valid]]
+        exit_[index[valid]] = bars['close'][exit_idx[valid]]
+    return entry, exit_
+
+
+def summarize(returns):
+    if len(returns) == 0:
+        return {'trades': 0}
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    return {
+        'trades': int(len(returns)),
+        'win_rate': float((returns > 0).mean()),
+        'average_return': float(returns.mean()),
+        'median_return': float(np.median(returns)),
+        'total_return': float(returns.sum()),
+        'sharpe': float(returns.mean() / std) if std > 0 else None
+    }
+
+
+# Worker state, set once per process by the pool initializer
+_store = None
+_signals = None
+
+
+def _init_worker(price_root, signals):
+    global _store, _signals
+    _store = PriceStore(price_root)
+    _signals = signals
+
+
+def _run_hold(hold, thresholds, min_users):
+    entry, exit_ = entry_exit_prices(_store, _signals, hold)
+    priced = ~(np.isnan(entry) | np.isnan(exit_)) & (entry > 0)
+    mention_count = _signals['mention_count'].to_numpy()
+    user_count = _signals['user_count'].to_numpy()
+
+    results = []
+    for threshold, users in itertools.product(thresholds, min_users):
+        mask = priced & (mention_count >= threshold) & (user_count >= users)
+        for direction in DIRECTIONS:
+            returns = calculate_performance(direction, entry[mask], exit_[mask])
+            results.append(dict(
+                {'threshold': threshold, 'min_users': users, 'hold': hold, 'direction': direction},
+                **summarize(returns)
+            ))
+    return results
+
+
+def run_grid(price_root, signals, thresholds, holds, min_users=(0,), workers=None):
+    """Evaluate every (threshold, min_users, hold, direction) combination.
+
+    Hold periods are spread across a process pool; each worker memory-maps
+    the price files it needs, so nothing but the signal table is pickled.
+    """
+    signals = signals.reset_index(drop=True)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(price_root, signals)
+    ) as pool:
+        futures = [pool.submit(_run_hold, hold, list(thresholds), list(min_users)) for hold in holds]
+        results = [row for future in futures for row in future.result()]
+    return sorted(results, key=lambda r: (r['threshold'], r['min_users'], r['hold'], r['direction']))
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.path.join(here, 'instance', 'trader.db'))
+    parser.add_argument('--prices', default=os.getenv('PRICE_STORE_DIR', os.path.join(here, 'data', 'prices')))
+    parser.add_argument('--thresholds', type=_int_list, default=[1, 2, 3, 5, 10])
+    parser.add_argument('--min-users', type=_int_list, default=[0, 2])
+    parser.add_argument('--holds', type=_int_list, default=[1, 3, 5, 10, 20])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    signals = load_signals(create_engine(f'sqlite:///{args.db}'))
+    started = time.perf_counter()
+    results = run_grid(args.prices, signals, args.thresholds, args.holds, args.min_users, args.workers)
+    print(json.dumps(results, indent=2))
+    print(f"{len(signals)} signals, {len(results)} grid points in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
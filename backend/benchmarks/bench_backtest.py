@@ -0,0 +1,59 @@
+"""Time a full backtest parameter sweep over a synthetic local price store.
+
+    python benchmarks/bench_backtest.py [n_tickers] [years] [n_signals]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import run_grid  # noqa: E402
+from price_store import BAR_DTYPE, PriceStore  # noqa: E402
+
+
+def build_store(root, n_tickers, years, rng):
+    store = PriceStore(root)
+    dates = np.busday_offset('2015-01-01', np.arange(int(252 * years)), roll='forward')
+    for i in range(n_tickers):
+        close = 20 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+        bars = np.empty(len(dates), dtype=BAR_DTYPE)
+        bars['date'] = dates
+        bars['open'] = close * (1 + rng.normal(0, 0.005, len(dates)))
+        bars['high'] = np.maximum(bars['open'], close) * 1.01
+        bars['low'] = np.minimum(bars['open'], close) * 0.99
+        bars['close'] = close
+        bars['volume'] = rng.integers(1e5, 1e7, len(dates))
+        store.write(f'T{i:04d}', bars)
+    return dates
+
+
+def build_signals(dates, n_tickers, n_signals, rng):
+    return pd.DataFrame({
+        'ticker': [f'T{i:04d}' for i in rng.integers(0, n_tickers, n_signals)],
+        'date': rng.choice(dates, n_signals),
+        'mention_count': rng.geometric(0.3, n_signals),
+        'user_count': rng.integers(1, 6, n_signals)
+    })
+
+
+if __name__ == '__main__':
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    years = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    n_signals = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    rng = np.random.default_rng(7)
+
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        dates = build_store(root, n_tickers, years, rng)
+        signals = build_signals(dates, n_tickers, n_signals, rng)
+        print(f"Built {n_tickers} tickers x {len(dates)} bars, {n_signals:,} signals in {time.perf_counter() - start:.2f}s")
+
+        for workers in (1, os.cpu_count()):
+            start = time.perf_counter()
+            results = run_grid(root, signals, [1, 2, 3, 5, 10], [1, 3, 5, 10, 20], [0, 2, 3], workers=workers)
+            print(f"{len(results)} grid points with {workers} worker(s): {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,115 @@
+"""Compare the legacy per-ticker quote loop with the bulk quote engine.
+
+Runs entirely against a local stubbed data source with simulated upstream
+latency, so no network access is needed:
+
+    python benchmarks/bench_quote_engine.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quote_engine import fetch_quotes  # noqa: E402
+
+# Simulated upstream round-trip latencies (seconds)
+PER_SYMBOL_LATENCY = 0.05
+BULK_BASE_LATENCY = 0.15
+BULK_PER_SYMBOL_LATENCY = 0.001
+LEGACY_BATCH_SIZE = 2
+LEGACY_BATCH_SLEEP = 2
+
+
+def make_tickers(n):
+    return [f'T{i:04d}' for i in range(n)]
+
+
+def price_for(ticker, day):
+    return 50 + (hash(ticker) % 100) + day
+
+
+class StubTicker:
+    def __init__(self, ticker, counter):
+        self.ticker = ticker
+        counter['calls'] += 1
+        time.sleep(PER_SYMBOL_LATENCY)
+
+    @property
+    def fast_info(self):
+        return {
+            'lastPrice': price_for(self.ticker, 4),
+            'previousClose': price_for(self.ticker, 3)
+        }
+
+
+def stub_downloader(counter, drop=()):
+    def download(tickers, **kwargs):
+        counter['calls'] += 1
+        time.sleep(BULK_BASE_LATENCY + BULK_PER_SYMBOL_LATENCY * len(tickers))
+        index = pd.date_range('2024-01-01', periods=5, freq='D')
+        closes = {
+            t: [np.nan] * 5 if t in drop else [price_for(t, d) for d in range(5)]
+            for t in tickers
+        }
+        frame = pd.DataFrame(closes, index=index)
+        return pd.concat({'Close': frame, 'Open': frame}, axis=1)
+    return download
+
+
+def legacy_fetch(tickers, counter):
+    # Mirrors the original get_stock_data loop; batch sleeps are counted, not slept
+    stock_data = {}
+    virtual_sleep = 0
+    for i in range(0, len(tickers), LEGACY_BATCH_SIZE):
+        for ticker in tickers[i:i + LEGACY_BATCH_SIZE]:
+            info = StubTicker(ticker, counter).fast_info
+            current_price = info['lastPrice']
+            last_close = info['previousClose']
+            stock_data[ticker] = {
+                'current_price': current_price,
+                'daily_change': (current_price - last_close) / last_close * 100,
+                'last_close': last_close
+            }
+        virtual_sleep += LEGACY_BATCH_SLEEP
+    return stock_data, virtual_sleep
+
+
+def run(n):
+    tickers = make_tickers(n)
+    # A handful of symbols missing from the bulk result exercise the fallback path
+    dropped = set(tickers[::25])
+
+    legacy_counter = {'calls': 0}
+    start = time.perf_counter()
+    legacy, virtual_sleep = legacy_fetch(tickers, legacy_counter)
+    legacy_wall = time.perf_counter() - start
+
+    bulk_counter = {'calls': 0}
+    single_counter = {'calls': 0}
+    start = time.perf_counter()
+    bulk = fetch_quotes(
+        tickers,
+        downloader=stub_downloader(bulk_counter, drop=dropped),
+        ticker_factory=lambda t: StubTicker(t, single_counter)
+    )
+    bulk_wall = time.perf_counter() - start
+
+    for ticker in tickers:
+        assert abs(bulk[ticker]['daily_change'] - legacy[ticker]['daily_change']) < 1e-9
+
+    print(
+        f"{n:>5} tickers | legacy {legacy_wall + virtual_sleep:8.2f}s "
+        f"({legacy_counter['calls']} calls, {virtual_sleep}s sleep) | "
+        f"engine {bulk_wall:6.2f}s ({bulk_counter['calls']} bulk + "
+        f"{single_counter['calls']} fallback calls) | "
+        f"speedup {(legacy_wall + virtual_sleep) / bulk_wall:6.1f}x"
+    )
+
+
+if __name__ == '__main__':
+    for n in (10, 50, 200):
+        run(n)
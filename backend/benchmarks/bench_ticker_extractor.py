@@ -0,0 +1,53 @@
+"""Micro-benchmark for cashtag extraction over a synthetic tweet corpus.
+
+    python benchmarks/bench_ticker_extractor.py [n_tweets]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ticker_extractor import TickerExtractor  # noqa: E402
+
+LISTED = ['AAPL', 'MSFT', 'NVDA', 'TSLA', 'AMZN', 'META', 'GOOGL', 'AMD', 'PLTR', 'SOFI', 'BRK-B', 'BF-B']
+NOISE = ['$USD', '$100', '$money', 'US$5', '$EUR', '$ABCDEF']
+WORDS = 'the market is ripping today and I am loading up on calls before earnings lol'.split()
+
+
+def make_corpus(n, seed=7):
+    rng = random.Random(seed)
+    listed_tags = ['$' + s.replace('-', '.') for s in LISTED] + ['$' + s.lower() for s in LISTED[:4]]
+    corpus = []
+    for _ in range(n):
+        words = rng.choices(WORDS, k=rng.randint(8, 30))
+        # Roughly a third of tweets carry no cashtag at all
+        if rng.random() > 0.35:
+            for _ in range(rng.randint(1, 4)):
+                words.insert(rng.randrange(len(words)), rng.choice(listed_tags + NOISE))
+        corpus.append(' '.join(words))
+    return corpus
+
+
+def legacy_extract(text):
+    pattern = r'\$([A-Z]{1,5})'
+    return re.findall(pattern, text)
+
+
+def timed(label, func, corpus):
+    start = time.perf_counter()
+    result = func(corpus)
+    elapsed = time.perf_counter() - start
+    found = sum(len(symbols) for symbols in result)
+    print(f"{label:<28} {elapsed * 1000:8.1f} ms  {len(corpus) / elapsed:12,.0f} tweets/s  {found:8,} symbols")
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    corpus = make_corpus(n)
+    print(f"{n:,} synthetic tweets")
+    timed('legacy re.findall', lambda texts: [legacy_extract(t) for t in texts], corpus)
+    timed('extractor (unvalidated)', TickerExtractor().extract_batch, corpus)
+    timed('extractor (symbol set)', TickerExtractor(frozenset(LISTED)).extract_batch, corpus)
@@ -0,0 +1,261 @@
+"""Load-test the dashboard API under the dev server and the ASGI serving mode.
+
+Each server runs in a subprocess against a throwaway database, with yfinance
+and the Twitter API replaced by local stubs that add upstream latency. While
+a set of idle /stream clients stay connected, concurrent clients hammer the
+JSON routes. Throughput, p50/p99 latency and the server's thread count and
+resident memory (Linux only) are reported per mode:
+
+    python benchmarks/load_test.py --requests 3000 --concurrency 100 --streams 100
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Simulated upstream round-trip latencies (seconds)
+YFINANCE_LATENCY = 0.3
+TWITTER_LATENCY = 0.1
+TICKERS = [f'T{i:03d}' for i in range(200)]
+ROUTES = [
+    '/picks?limit=50',
+    '/positions',
+    '/trades?limit=50',
+    '/sectors?tickers=' + ','.join(TICKERS[:20]),
+    '/analytics',
+    '/cache/stats'
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class StubTwitter(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(TWITTER_LATENCY)
+        if self.path.startswith('/users/by'):
+            names = self.path.split('usernames=')[1].split('&')[0].split('%2C')
+            body = {'data': [{'id': str(1000 + i), 'username': name} for i, name in enumerate(names)]}
+        else:
+            body = {
+                'data': [{'id': str(9000 + i), 'text': f'${TICKERS[i]} looks good', 'created_at': None} for i in range(20)],
+                'meta': {'newest_id': '9019'}
+            }
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('x-rate-limit-limit', '1500')
+        self.send_header('x-rate-limit-remaining', '1400')
+        self.send_header('x-rate-limit-reset', str(int(time.time()) + 900))
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def install_yfinance_stub():
+    import pandas as pd
+    import yfinance as yf
+
+    def download(tickers, **kwargs):
+        time.sleep(YFINANCE_LATENCY)
+        index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=5)
+        frame = pd.DataFrame({t: 100.0 + np.arange(5) + hash(t) % 50 for t in tickers}, index=index)
+        fields = {field: frame for field in ('Open', 'High', 'Low', 'Close', 'Volume')}
+        if kwargs.get('group_by') == 'ticker':
+            return pd.concat({t: pd.DataFrame({f: fields[f][t] for f in fields}) for t in tickers}, axis=1)
+        return pd.concat(fields, axis=1)
+
+    yf.download = download
+
+
+def seed(app_module):
+    from datetime import date, timedelta
+    from models import db, Position, StockPick, TradeHistory
+
+    with app_module.app.app_context():
+        if StockPick.query.count():
+            return
+        today = date.today()
+        for i, ticker in enumerate(TICKERS):
+            db.session.add(StockPick(ticker=ticker, source='Manual', date=today - timedelta(days=i % 30)))
+            db.session.add(TradeHistory(
+                ticker=ticker, entry_price=100, exit_price=100 + i % 7 - 3,
+                performance=float(i % 7 - 3), date_closed=today - timedelta(days=i % 60)
+            ))
+        for ticker in TICKERS[:50]:
+            db.session.add(Position(ticker=ticker, entry_price=100, status='long'))
+        db.session.commit()
+
+
+def serve(mode, port):
+    # Runs in the server subprocess: stubs must be in place before app is imported
+    install_yfinance_stub()
+    import app as app_module
+    seed(app_module)
+    if mode == 'wsgi':
+        app_module.start_background_jobs()
+        app_module.app.run(port=port, threaded=True)
+    else:
+        import uvicorn
+        from asgi import application
+        uvicorn.run(application, port=port, log_level='warning')
+
+
+async def hold_stream(client, url):
+    try:
+        async with client.stream('GET', url, timeout=None) as response:
+            async for _ in response.aiter_raw():
+                pass
+    except (httpx.HTTPError, asyncio.CancelledError):
+        pass
+
+
+async def run_load(base, total, concurrency, streams, pid):
+    limits = httpx.Limits(max_connections=concurrency + streams + 10)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        stream_tasks = []
+        for i in range(streams):
+            stream_tasks.append(asyncio.create_task(
+                hold_stream(client, f'/stream?tickers={TICKERS[i % len(TICKERS)]}')
+            ))
+        await asyncio.sleep(1)
+
+        latencies = []
+        errors = 0
+        next_request = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for i in next_request:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(ROUTES[i % len(ROUTES)])
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        threads, rss = process_usage(pid)
+
+        for task in stream_tasks:
+            task.cancel()
+        await asyncio.gather(*stream_tasks, return_exceptions=True)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': total,
+        'errors': errors,
+        'throughput': total / wall,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'threads': threads,
+        'rss_mb': rss
+    }
+
+
+def wait_until_up(base, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            if httpx.get(f'{base}/cache/stats', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def process_usage(pid):
+    # Threads and resident memory (MB) from /proc, or None where unavailable
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return None, None
+    return int(fields['Threads']), int(fields['VmRSS'].split()[0]) / 1024
+
+
+def benchmark(mode, args, twitter_base):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            PRICE_STORE_DIR=os.path.join(tmp, 'prices'),
+            TWITTER_API_BASE=twitter_base,
+            TWITTER_BEARER_TOKEN='stub',
+            TWITTER_FOLLOWED_ACCOUNTS='alice,bob,carol',
+            QUOTE_REFRESH_INTERVAL='5'
+        )
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            base = f'http://127.0.0.1:{port}'
+            wait_until_up(base, process)
+            return asyncio.run(run_load(base, args.requests, args.concurrency, args.streams, process.pid))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--streams', type=int, default=100)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    twitter = ThreadingHTTPServer(('127.0.0.1', 0), StubTwitter)
+    threading.Thread(target=twitter.serve_forever, daemon=True).start()
+    twitter_base = f'http://127.0.0.1:{twitter.server_address[1]}'
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, {args.streams} open /stream clients")
+    for mode in args.modes.split(','):
+        result = benchmark(mode, args, twitter_base)
+        print(
+            f"{mode:>5} | {result['throughput']:8.1f} req/s | p50 {result['p50_ms']:7.1f} ms | "
+            f"p99 {result['p99_ms']:7.1f} ms | {result['errors']} errors | "
+            f"{result['threads']} threads, {result['rss_mb'] or 0:.0f} MB RSS"
+        )
+    twitter.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,594 @@
+"""Replay the refresh pipeline offline against fixture Twitter and yfinance upstreams.
+
+The Twitter v2 endpoints (/users/by, /users/:id/tweets) are served by a
+requests transport adapter mounted on the client's session, and yfinance's
+download/Ticker by in-process stand-ins. Both answer in the response shapes
+the real services use: paginated timelines honouring since_id, x-rate-limit-*
+headers, MultiIndex download frames. Fault scenarios add 429s, 5xx errors,
+unknown accounts and delisted symbols. Every sleep in the pipeline (rate
+limit waits, retry backoff) goes through a virtual clock, so it is reported
+but costs no wall time.
+
+Each scenario runs the real jobs against a fresh database, stage by stage:
+first Twitter fetch, incremental Twitter fetch, history top-up, then cold,
+warm and expired quote refreshes. Per stage the report shows wall time,
+virtual time slept, upstream calls, SQL statements on the calling thread and
+peak traced memory. Tracing slows allocation-heavy stages several times
+over, so compare wall times between runs with the same --no-memory setting:
+
+    python benchmarks/replay.py
+    python benchmarks/replay.py --accounts 100 --tweets 500 --tickers 2000 --faults 429,errors
+    python benchmarks/replay.py --json baseline.json
+    python benchmarks/replay.py --compare baseline.json   # exits 1 on a regression
+"""
+from collections import Counter
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+import yfinance as yf
+from yfinance.exceptions import YFRateLimitError, YFTickerMissingError
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# accounts, tweets per account, ticker universe
+DEFAULT_SCALES = [(5, 50, 100), (25, 200, 500), (100, 500, 2000)]
+FAULTS = ('429', 'errors')
+SECTORS = [
+    'Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical', 'Industrials',
+    'Communication Services', 'Consumer Defensive', 'Energy', 'Utilities', 'Real Estate', 'Basic Materials'
+]
+PERIOD_SESSIONS = {'1d': 1, '2d': 2, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504}
+
+# Fault injection, as "every Nth call"
+TWITTER_RATE_LIMITED_EVERY = 10  # Another consumer of the token drains the window
+TWITTER_ERROR_EVERY = 8  # 503 Service Unavailable
+UNKNOWN_ACCOUNT_EVERY = 10
+YF_RATE_LIMITED_EVERY = 4
+YF_ERROR_EVERY = 5  # Connection reset
+DELISTED_EVERY = 40
+
+# Regression thresholds for --compare; counts are deterministic and must not grow
+WALL_TOLERANCE = 0.25
+WALL_NOISE_FLOOR = 0.05  # Seconds
+MEMORY_TOLERANCE = 0.25
+
+
+class VirtualClock:
+    """time()/sleep() pair where sleeping only moves the clock forward.
+
+    Safe to share between threads. Concurrent sleeps are added rather than
+    overlapped, so virtual time is an upper bound on what a real run waits.
+    """
+
+    def __init__(self, start=None):
+        self.now = start if start is not None else time.time()
+        self.slept = 0.0
+        self._lock = threading.Lock()
+
+    def time(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            seconds = max(seconds, 0)
+            self.now += seconds
+            self.slept += seconds
+
+    def advance(self, seconds):
+        # Time passing between jobs; not counted as sleeping
+        with self._lock:
+            self.now += seconds
+
+
+class CallCounter:
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, key):
+        with self._lock:
+            self.counts[key] += 1
+            return self.counts[key]
+
+    def snapshot(self):
+        with self._lock:
+            return Counter(self.counts)
+
+
+def make_tickers(n):
+    # Four uppercase letters, so cashtags pass the extractor without a listing file
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return [f'X{letters[i // 676 % 26]}{letters[i // 26 % 26]}{letters[i % 26]}' for i in range(n)]
+
+
+class TwitterFixtures(BaseAdapter):
+    """Twitter API v2 stand-in, mounted on TwitterClient.session in place of HTTP.
+
+    Timelines are generated deterministically and served newest first,
+    max_results per page with next_token pagination. Each endpoint has a
+    15-minute rate-limit window kept in virtual time.
+    """
+
+    WINDOW = 900
+
+    def __init__(self, accounts, tweets, tickers, faults, clock, calls, seed=0):
+        super().__init__()
+        self.faults = faults
+        self.clock = clock
+        self.calls = calls
+        self.tickers = tickers
+        self.random = random.Random(seed)
+        self.users = {
+            name: str(1_000_000 + i) for i, name in enumerate(accounts)
+            if not ('errors' in faults and i % UNKNOWN_ACCOUNT_EVERY == UNKNOWN_ACCOUNT_EVERY - 1)
+        }
+        self.timelines = {user_id: [] for user_id in self.users.values()}  # Oldest first
+        self.next_id = 10 ** 15
+        self.windows = {
+            'users': [5 if '429' in faults else 300, 0, 0],  # limit, remaining, reset
+            'tweets': [50 if '429' in faults else 1500, 0, 0]
+        }
+        self._lock = threading.Lock()
+        self.post(tweets)
+
+    def post(self, per_account):
+        """Add `per_account` new tweets to every timeline."""
+        now = self.clock.time()
+        for user_id, timeline in self.timelines.items():
+            for i in range(per_account):
+                symbols = self.random.sample(self.tickers, self.random.choice((0, 1, 1, 2, 3)))
+                text = ' '.join(f'${s}' for s in symbols) or 'Markets are quiet today'
+                created = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(now - (per_account - i) * 60))
+                timeline.append({'id': str(self.next_id), 'text': f'Watching {text}', 'created_at': created})
+                self.next_id += 1
+
+    def _rate_limit(self, endpoint, count):
+        # Returns (allowed, headers) for this request's window
+        with self._lock:
+            window = self.windows[endpoint]
+            now = self.clock.time()
+            if now >= window[2]:
+                window[1], window[2] = window[0], now + self.WINDOW
+            if '429' in self.faults and count % TWITTER_RATE_LIMITED_EVERY == 0:
+                window[1] = 0
+            allowed = window[1] > 0
+            if allowed:
+                window[1] -= 1
+            headers = {
+                'x-rate-limit-limit': str(window[0]),
+                'x-rate-limit-remaining': str(window[1]),
+                'x-rate-limit-reset': str(int(window[2]))
+            }
+            return allowed, headers
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = url.path.rstrip('/').split('/')
+        endpoint = 'users' if parts[-1] == 'by' else 'tweets'
+        count = self.calls.inc(f'twitter.{endpoint}')
+
+        allowed, headers = self._rate_limit(endpoint, count)
+        if not allowed:
+            status, body = 429, {'title': 'Too Many Requests', 'status': 429}
+        elif 'errors' in self.faults and endpoint == 'tweets' and count % TWITTER_ERROR_EVERY == 0:
+            status, body = 503, {'title': 'Service Unavailable', 'status': 503}
+        elif endpoint == 'users':
+            status, body = 200, self._users(query.get('usernames', '').split(','))
+        else:
+            status, body = 200, self._timeline(parts[-2], query)
+        if status != 200:
+            self.calls.inc(f'twitter.{endpoint}.{status}')
+        return self._response(request, status, body, headers)
+
+    def _users(self, names):
+        body = {'data': [{'id': self.users[n], 'name': n, 'username': n} for n in names if n in self.users]}
+        unknown = [n for n in names if n not in self.users]
+        if unknown:
+            body['errors'] = [{
+                'value': n, 'detail': f'Could not find user with usernames: [{n}].', 'title': 'Not Found Error'
+            } for n in unknown]
+        return body
+
+    def _timeline(self, user_id, query):
+        timeline = self.timelines.get(user_id, [])
+        since_id = int(query.get('since_id', 0))
+        page_size = int(query.get('max_results', 10))
+        offset = int(query.get('pagination_token', 0))
+        newer = [t for t in reversed(timeline) if int(t['id']) > since_id]
+        page = newer[offset:offset + page_size]
+        if not page:
+            return {'meta': {'result_count': 0}}
+        meta = {
+            'result_count': len(page),
+            'newest_id': newer[0]['id'],
+            'oldest_id': page[-1]['id']
+        }
+        if offset + page_size < len(newer):
+            meta['next_token'] = str(offset + page_size)
+        return {'data': page, 'meta': meta}
+
+    def _response(self, request, status, body, headers):
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTPStatus(status).phrase
+        response._content = json.dumps(body).encode()
+        response.headers = CaseInsensitiveDict(headers, **{'content-type': 'application/json; charset=utf-8'})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class MarketFixtures:
+    """yf.download / yf.Ticker stand-in with deterministic daily prices."""
+
+    def __init__(self, tickers, faults, calls):
+        self.faults = faults
+        self.calls = calls
+        self.delisted = set(tickers[DELISTED_EVERY - 1::DELISTED_EVERY]) if 'errors' in faults else set()
+
+    def _fault(self, call, count):
+        if '429' in self.faults and count % YF_RATE_LIMITED_EVERY == 0:
+            self.calls.inc(f'yfinance.{call}.rate_limited')
+            raise YFRateLimitError()
+        if 'errors' in self.faults and count % YF_ERROR_EVERY == 0:
+            self.calls.inc(f'yfinance.{call}.error')
+            raise requests.ConnectionError('Connection reset by peer')
+
+    def _sessions(self, period=None, start=None):
+        today = pd.Timestamp.now().normalize()
+        if start is not None:
+            return pd.bdate_range(start=pd.Timestamp(start), end=today, name='Date')
+        return pd.bdate_range(end=today, periods=PERIOD_SESSIONS.get(period, 5), name='Date')
+
+    def _closes(self, tickers, index):
+        base = np.array([20 + zlib.crc32(t.encode()) % 300 for t in tickers], dtype=float)
+        days = np.array([d.toordinal() for d in index], dtype=float)
+        closes = base * (1 + 0.02 * np.sin(days[:, None] * 0.3 + base[None, :]))
+        frame = pd.DataFrame(closes, index=index, columns=tickers)
+        dead = [t for t in tickers if t in self.delisted]
+        if dead:
+            frame[dead] = np.nan
+        return frame
+
+    def download(self, tickers, period=None, start=None, group_by='column', **kwargs):
+        tickers = tickers.split() if isinstance(tickers, str) else list(tickers)
+        self._fault('download', self.calls.inc('yfinance.download'))
+        index = self._sessions(period, start)
+        if not len(index):
+            return pd.DataFrame()
+        closes = self._closes(tickers, index)
+        fields = {
+            'Adj Close': closes, 'Close': closes, 'High': closes * 1.01, 'Low': closes * 0.99,
+            'Open': closes * 0.995, 'Volume': closes * 0 + 1_000_000
+        }
+        data = pd.concat(fields, axis=1, names=['Price', 'Ticker'])
+        if group_by == 'ticker':
+            data = data.swaplevel(axis=1).sort_index(axis=1)
+        return data
+
+    def ticker(self, symbol):
+        return FixtureTicker(self, symbol)
+
+
+class FixtureTicker:
+    def __init__(self, market, symbol):
+        self.market = market
+        self.symbol = symbol
+
+    @property
+    def fast_info(self):
+        self.market._fault('fast_info', self.market.calls.inc('yfinance.fast_info'))
+        if self.symbol in self.market.delisted:
+            raise KeyError('lastPrice')
+        closes = self.market._closes([self.symbol], self.market._sessions('2d'))[self.symbol]
+        return {'lastPrice': float(closes.iloc[-1]), 'previousClose': float(closes.iloc[-2])}
+
+    def history(self, period='1mo', interval='1d', raise_errors=False, **kwargs):
+        self.market._fault('history', self.market.calls.inc('yfinance.history'))
+        if self.symbol in self.market.delisted:
+            if raise_errors:
+                raise YFTickerMissingError(self.symbol, 'no price data found')
+            return pd.DataFrame()
+        closes = self.market._closes([self.symbol], self.market._sessions(period))
+        return closes.rename(columns={self.symbol: 'Close'})
+
+    @property
+    def info(self):
+        self.market.calls.inc('yfinance.info')
+        return {'sector': SECTORS[zlib.crc32(self.symbol.encode()) % len(SECTORS)]}
+
+
+# yfinance entry points are captured as default arguments at import time, so
+# the dispatchers go in before the app is imported and delegate to whichever
+# scenario is running
+current_market = None
+
+
+def install_yfinance_fixtures():
+    yf.download = lambda tickers, **kwargs: current_market.download(tickers, **kwargs)
+    yf.Ticker = lambda symbol, *args, **kwargs: current_market.ticker(symbol)
+
+
+def import_app(workdir):
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'replay.db')}",
+        'PRICE_STORE_DIR': os.path.join(workdir, 'prices'),
+        'SECTOR_FILE': os.path.join(workdir, 'sectors.csv'),
+        'SYMBOL_LISTING_FILE': os.path.join(workdir, 'symbols.txt'),
+        'STATE_BACKEND': 'memory',
+        'TWITTER_BEARER_TOKEN': 'replay',
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'CRITICAL')
+    })
+    install_yfinance_fixtures()
+    import app as app_module
+    return app_module
+
+
+def setup_scenario(app_module, scenario, workdir):
+    """Point the app's module-level collaborators at fresh fixtures and a fresh database."""
+    global current_market
+    from health import CircuitBreaker, TickerHealth
+    from models import db
+    from price_store import PriceStore
+    from quote_cache import QuoteCache
+    from quote_engine import fetch_quotes
+    from refresher import Watchlist
+    from sectors import SectorAggregates, save_classifications
+    from shared_state import MemoryStateBackend
+    from twitter_client import TwitterClient
+
+    clock = VirtualClock()
+    calls = CallCounter()
+    tickers = make_tickers(scenario['tickers'])
+    accounts = [f"trader{i}" for i in range(scenario['accounts'])]
+    faults = scenario['faults']
+    twitter = TwitterFixtures(accounts, scenario['tweets'], tickers, faults, clock, calls)
+    current_market = MarketFixtures(tickers, faults, calls)
+
+    app_module.ticker_health = TickerHealth(
+        bad_ttl=app_module.TICKER_BAD_TTL, retry_after=app_module.TICKER_RETRY_AFTER, clock=clock.time
+    )
+    app_module.breakers = {
+        name: CircuitBreaker(
+            name, failure_threshold=app_module.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=app_module.BREAKER_RESET_TIMEOUT, clock=clock.time
+        )
+        for name in ('yfinance', 'twitter')
+    }
+    client = TwitterClient(
+        'replay',
+        users_limit=app_module.TWITTER_USERS_RATE_LIMIT,
+        tweets_limit=app_module.TWITTER_TWEETS_RATE_LIMIT,
+        breaker=app_module.breakers['twitter'],
+        pool_size=max(app_module.TWITTER_HTTP_POOL_SIZE, app_module.TWITTER_MAX_WORKERS),
+        clock=clock.time,
+        sleep=clock.sleep
+    )
+    client.session.mount('https://', twitter)
+    client.session.mount('http://', twitter)
+    app_module.twitter_client = client
+    app_module.shared_state = MemoryStateBackend(clock=clock.time)
+    app_module.quote_cache = QuoteCache(
+        max_size=max(app_module.QUOTE_CACHE_SIZE, len(tickers)),
+        market_ttl=app_module.QUOTE_TTL_MARKET_HOURS,
+        closed_ttl=app_module.QUOTE_TTL_AFTER_HOURS,
+        clock=clock.time
+    )
+    prices = os.path.join(workdir, 'prices')
+    shutil.rmtree(prices, ignore_errors=True)
+    app_module.price_store = PriceStore(prices)
+    app_module.sector_aggregates = SectorAggregates()
+    app_module.watchlist = Watchlist(clock=clock.time)
+    app_module.last_snapshot_save = 0
+
+    def fetch_stock_data(tickers):
+        # As app.fetch_stock_data, with retry backoff on the virtual clock
+        return fetch_quotes(
+            list(tickers),
+            price_store=app_module.price_store,
+            health=app_module.ticker_health,
+            breaker=app_module.breakers['yfinance'],
+            sleep=clock.sleep
+        )
+    app_module.fetch_stock_data = fetch_stock_data
+    os.environ['TWITTER_FOLLOWED_ACCOUNTS'] = ','.join(accounts)
+
+    with app_module.app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Every ticker is classified, so the whole universe is tracked
+        save_classifications([{
+            'ticker': t,
+            'sector': SECTORS[i % len(SECTORS)],
+            'industry': None,
+            'shares_outstanding': 1e6 * (1 + i % 500)
+        } for i, t in enumerate(tickers)])
+    return clock, calls, twitter
+
+
+def stages(app_module, scenario, clock, twitter):
+    """(name, callable) pairs in the order a refresher would run them."""
+    def incremental():
+        # The next scheduled run, with a few new tweets per account
+        clock.advance(app_module.TWITTER_REFRESH_INTERVAL)
+        twitter.post(max(1, scenario['tweets'] // 10))
+        app_module.fetch_twitter_stocks()
+
+    def quotes_expired():
+        clock.advance(app_module.QUOTE_TTL_AFTER_HOURS + 1)
+        app_module.refresh_quotes()
+
+    return [
+        ('twitter_initial', app_module.fetch_twitter_stocks),
+        ('twitter_incremental', incremental),
+        ('history_top_up', app_module.refresh_history),
+        ('quotes_cold', app_module.refresh_quotes),
+        ('quotes_warm', app_module.refresh_quotes),
+        ('quotes_expired', quotes_expired)
+    ]
+
+
+def run_stage(app_module, name, func, clock, calls, trace_memory):
+    from database import begin_query_scope, end_query_scope
+
+    calls_before = calls.snapshot()
+    slept_before = clock.slept
+    if trace_memory:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    with app_module.app.app_context():
+        begin_query_scope()
+        started = time.perf_counter()
+        func()
+        wall = time.perf_counter() - started
+        statements, _ = end_query_scope(f'replay:{name}') or (0, 0)
+    upstream = calls.snapshot()
+    upstream.subtract(calls_before)
+    return {
+        'stage': name,
+        'wall_s': wall,
+        'virtual_sleep_s': clock.slept - slept_before,
+        'upstream': {key: n for key, n in sorted(upstream.items()) if n},
+        'statements': statements,
+        'peak_kb': (tracemalloc.get_traced_memory()[1] - memory_before) / 1024 if trace_memory else None
+    }
+
+
+def run_scenario(app_module, scenario, workdir, trace_memory):
+    clock, calls, twitter = setup_scenario(app_module, scenario, workdir)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        return [
+            run_stage(app_module, name, func, clock, calls, trace_memory)
+            for name, func in stages(app_module, scenario, clock, twitter)
+        ]
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+
+def scenario_name(scenario):
+    name = f"{scenario['accounts']}a/{scenario['tweets']}t/{scenario['tickers']}s"
+    return name + (f" [{','.join(scenario['faults'])}]" if scenario['faults'] else '')
+
+
+def default_suite():
+    suite = [{'accounts': a, 'tweets': t, 'tickers': s, 'faults': []} for a, t, s in DEFAULT_SCALES]
+    a, t, s = DEFAULT_SCALES[1]
+    suite.extend({'accounts': a, 'tweets': t, 'tickers': s, 'faults': [fault]} for fault in FAULTS)
+    return suite
+
+
+def summarize_calls(upstream):
+    # twitter.tweets=120(429x3) yfinance.download=5
+    totals = {key: n for key, n in upstream.items() if key.count('.') == 1}
+    parts = []
+    for key, n in totals.items():
+        failures = [f"{k.rsplit('.', 1)[1]}x{m}" for k, m in upstream.items() if k.startswith(key + '.')]
+        parts.append(f"{key}={n}" + (f"({','.join(failures)})" if failures else ''))
+    return ' '.join(parts) or '-'
+
+
+def print_report(results):
+    print(f"{'stage':<20} {'wall ms':>9} {'slept s':>9} {'SQL':>6} {'peak KB':>9}  upstream calls")
+    for name, rows in results.items():
+        print(f"\n{name}")
+        for row in rows:
+            peak = '-' if row['peak_kb'] is None else f"{row['peak_kb']:.0f}"
+            print(f"  {row['stage']:<18} {row['wall_s'] * 1000:>9.1f} {row['virtual_sleep_s']:>9.0f} "
+                  f"{row['statements']:>6} {peak:>9}  {summarize_calls(row['upstream'])}")
+
+
+def regressions(results, baseline):
+    """Differences from a saved run that count as regressions."""
+    found = []
+    for name, rows in results.items():
+        before = {row['stage']: row for row in baseline.get(name, [])}
+        for row in rows:
+            old = before.get(row['stage'])
+            if old is None:
+                continue
+            where = f"{name} {row['stage']}"
+            calls, old_calls = sum(row['upstream'].values()), sum(old['upstream'].values())
+            if calls > old_calls:
+                found.append(f"{where}: upstream calls {old_calls} -> {calls}")
+            if row['statements'] > old['statements']:
+                found.append(f"{where}: SQL statements {old['statements']} -> {row['statements']}")
+            same_tracing = (row['peak_kb'] is None) == (old.get('peak_kb') is None)
+            slower = row['wall_s'] - old['wall_s']
+            if same_tracing and slower > old['wall_s'] * WALL_TOLERANCE and slower > WALL_NOISE_FLOOR:
+                found.append(f"{where}: wall time {old['wall_s'] * 1000:.0f}ms -> {row['wall_s'] * 1000:.0f}ms")
+            if row['peak_kb'] and old.get('peak_kb') and row['peak_kb'] > old['peak_kb'] * (1 + MEMORY_TOLERANCE):
+                found.append(f"{where}: peak memory {old['peak_kb']:.0f}KB -> {row['peak_kb']:.0f}KB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, help='Followed accounts (runs one scenario instead of the suite)')
+    parser.add_argument('--tweets', type=int, default=200, help='Tweets per account in the first fetch')
+    parser.add_argument('--tickers', type=int, default=500, help='Tracked ticker universe')
+    parser.add_argument('--faults', default='', help=f"Comma-separated faults to inject: {', '.join(FAULTS)}")
+    parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc for undistorted wall times')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Baseline results from --json; exit 1 on a regression')
+    args = parser.parse_args()
+
+    faults = [f for f in args.faults.split(',') if f]
+    unknown = set(faults) - set(FAULTS)
+    if unknown:
+        parser.error(f"unknown faults {', '.join(sorted(unknown))}")
+    if args.accounts is not None:
+        suite = [{'accounts': args.accounts, 'tweets': args.tweets, 'tickers': args.tickers, 'faults': faults}]
+    else:
+        suite = default_suite()
+
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    try:
+        app_module = import_app(workdir)
+        results = {}
+        for scenario in suite:
+            results[scenario_name(scenario)] = run_scenario(app_module, scenario, workdir, not args.no_memory)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(results, json.load(f))
+        print(f"\n{len(found)} regression(s) against {args.compare}")
+        for line in found:
+            print(f"  {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""Batch import and streaming export of picks, positions and trades.
+
+Uploads are a JSON array, NDJSON (one object per line) or CSV with a header
+row; NDJSON and CSV are parsed from the request stream as it arrives. Every
+record is validated on its own: invalid ones are reported back by position
+and skipped, valid ones are inserted CHUNK_SIZE at a time, one transaction
+per chunk. Validators return values in the form SQLite stores them (ISO
+text for dates), so rows go to the driver without further conversion.
+Exports are generated from a server-side cursor in batches, so memory stays
+flat however many rows are dumped. The export columns are the import
+fields, ids included: records whose id is already taken are skipped as
+duplicates, so loading an export back into the same database adds nothing.
+"""
+from datetime import date, datetime, UTC
+from operator import itemgetter
+import csv
+import io
+import json
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from analytics import calculate_performance, memo as analytics_memo
+from listing import ListingError, parse_date
+from models import db, Position, StockPick, TradeHistory
+
+CHUNK_SIZE = 20000
+EXPORT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+TICKER_MAX_LENGTH = 10
+# Text format SQLAlchemy's SQLite DateTime type stores and parses
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+POSITION_STATUSES = ('long', 'short')
+PICK_SOURCES = ('AI', 'Manual')
+
+# Upload mimetype -> parser; export format -> mimetype
+IMPORT_TYPES = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv'
+}
+EXPORT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+EXPORT_COLUMNS = {
+    StockPick: ['id', 'ticker', 'source', 'date', 'mention_count', 'twitter_users', 'last_updated', 'position_type'],
+    Position: ['id', 'ticker', 'entry_price', 'exit_price', 'status', 'performance'],
+    TradeHistory: ['id', 'ticker', 'entry_price', 'exit_price', 'performance', 'date_closed']
+}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _ndjson(stream):
+    # Undecodable lines are passed on as errors so they're reported by position
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+
+
+def read_records(request):
+    """Iterate over the uploaded records without reading a streamed body up front."""
+    kind = IMPORT_TYPES.get(request.mimetype)
+    if kind == 'json':
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            raise ListingError('Expected a JSON array of objects')
+        return iter(records)
+    if kind == 'ndjson':
+        return _ndjson(io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8'))
+    if kind == 'csv':
+        return csv.DictReader(io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8', newline=''))
+    raise ImportFormatError(f"Unsupported upload type {request.mimetype or 'none'}; "
+                            f"use one of {', '.join(IMPORT_TYPES)}")
+
+
+def _present(value):
+    # CSV cells are strings; an empty cell means the field was left out
+    return value is not None and value != ''
+
+
+def _ticker(record):
+    ticker = str(record.get('ticker') or '').strip().upper()
+    if not ticker:
+        raise ValueError('ticker is required')
+    if len(ticker) > TICKER_MAX_LENGTH:
+        raise ValueError(f"ticker '{ticker}' is longer than {TICKER_MAX_LENGTH} characters")
+    return ticker
+
+
+def _number(record, field, required=True, kind=float):
+    value = record.get(field)
+    if not _present(value):
+        if required:
+            raise ValueError(f'{field} is required')
+        return None
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    if number != number or number in (float('inf'), float('-inf')):
+        raise ValueError(f'{field} must be a finite number')
+    return number
+
+
+def _price(record, field, required=True):
+    price = _number(record, field, required)
+    if price is not None and price <= 0:
+        raise ValueError(f'{field} must be positive')
+    return price
+
+
+def _choice(record, field, choices, default=None):
+    value = record.get(field)
+    if not _present(value):
+        if default is None:
+            raise ValueError(f"{field} is required (one of {', '.join(choices)})")
+        return default
+    if value not in choices:
+        raise ValueError(f"{field} must be one of {', '.join(choices)}, got {value!r}")
+    return value
+
+
+def _id(record):
+    # Kept from exports so a re-import is deduplicated; None lets SQLite assign one
+    row_id = _number(record, 'id', required=False, kind=int)
+    if row_id is not None and row_id <= 0:
+        raise ValueError('id must be positive')
+    return row_id
+
+
+def _date(record, field):
+    value = record.get(field)
+    if not _present(value):
+        return datetime.now(UTC).date().isoformat()
+    # Exports write datetimes for some columns; accept a date prefix
+    return parse_date(str(value)[:10]).isoformat()
+
+
+def validate_trade(record):
+    entry_price = _price(record, 'entry_price')
+    exit_price = _price(record, 'exit_price')
+    performance = _number(record, 'performance', required=False)
+    if performance is None:
+        status = _choice(record, 'status', POSITION_STATUSES, default='long')
+        performance = calculate_performance(status, entry_price, exit_price)
+    return TradeHistory, {
+        'id': _id(record),
+        'ticker': _ticker(record),
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'performance': performance,
+        'date_closed': _date(record, 'date_closed')
+    }
+
+
+def validate_position(record):
+    # Same rules as POST /positions: a record with an exit price is a closed trade
+    ticker = _ticker(record)
+    entry_price = _price(record, 'entry_price')
+    exit_price = _price(record, 'exit_price', required=False)
+    status = _choice(record, 'status', POSITION_STATUSES)
+    if exit_price:
+        # Becomes a new trade; a position's id means nothing in trade_history
+        return TradeHistory, {
+            'id': None,
+            'ticker': ticker,
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'performance': calculate_performance(status, entry_price, exit_price),
+            'date_closed': _date(record, 'date_closed')
+        }
+    return Position, {
+        'id': _id(record),
+        'ticker': ticker,
+        'entry_price': entry_price,
+        'exit_price': None,
+        'status': status,
+        'performance': None
+    }
+
+
+def _timestamp(record, field):
+    value = record.get(field)
+    if not _present(value):
+        timestamp = datetime.utcnow()
+    else:
+        try:
+            timestamp = datetime.fromisoformat(str(value))
+        except ValueError:
+            raise ValueError(f"{field} must be an ISO timestamp, got {value!r}")
+    return timestamp.strftime(SQLITE_DATETIME_FORMAT)
+
+
+def validate_pick(record):
+    source = _choice(record, 'source', PICK_SOURCES)
+    users = record.get('twitter_users')
+    if isinstance(users, list):
+        users = ','.join(str(u) for u in users)
+    mention_count = _number(record, 'mention_count', required=False, kind=int)
+    position_type = None
+    if source == 'Manual' and _present(record.get('position_type')):
+        position_type = _choice(record, 'position_type', POSITION_STATUSES)
+    return StockPick, {
+        'id': _id(record),
+        'ticker': _ticker(record),
+        'source': source,
+        'date': _date(record, 'date'),
+        'mention_count': 1 if mention_count is None else mention_count,
+        'twitter_users': users or None,
+        'last_updated': _timestamp(record, 'last_updated'),
+        'position_type': position_type
+    }
+
+
+def _insert_many(model, rows):
+    """INSERT ... ON CONFLICT DO NOTHING for every row; returns how many went in.
+
+    The statement is compiled once and run as a single driver-level
+    executemany: per-row parameter processing in SQLAlchemy costs more than
+    the insert itself at these volumes. Rows hitting a unique constraint (an
+    id already taken, a pick already recorded that day) are skipped.
+    """
+    columns = list(rows[0])
+    connection = db.session.connection()
+    compiled = sqlite_insert(model.__table__).on_conflict_do_nothing().compile(
+        dialect=connection.dialect, column_keys=columns
+    )
+    values = itemgetter(*compiled.positiontup)
+    result = connection.exec_driver_sql(compiled.string, [values(row) for row in rows])
+    return result.rowcount
+
+
+def _flush(pending, summary):
+    touched = [model.__table__ for model, rows in pending.items() if rows]
+    for model, rows in pending.items():
+        if not rows:
+            continue
+        inserted = _insert_many(model, rows)
+        table = model.__tablename__
+        summary['inserted'][table] = summary['inserted'].get(table, 0) + inserted
+        summary['duplicates'] += len(rows) - inserted
+        rows.clear()
+    db.session.commit()
+    if any(table in analytics_memo.tables for table in touched):
+        # Core statements don't go through the ORM events the memo listens to
+        analytics_memo.invalidate()
+
+
+def import_records(records, validate, chunk_size=CHUNK_SIZE):
+    """Validate and insert records; returns counts and the first few errors."""
+    summary = {'received': 0, 'inserted': {}, 'duplicates': 0, 'invalid': 0, 'errors': []}
+    pending = {}
+    buffered = 0
+    for position, record in enumerate(records, 1):
+        summary['received'] += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError('Expected an object')
+            model, row = validate(record)
+        except ValueError as e:
+            summary['invalid'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'record': position, 'error': str(e)})
+            continue
+        pending.setdefault(model, []).append(row)
+        buffered += 1
+        if buffered >= chunk_size:
+            _flush(pending, summary)
+            buffered = 0
+    _flush(pending, summary)
+    return summary
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def export_rows(model, fmt, where=()):
+    """Generate the export body chunk by chunk, one database batch at a time."""
+    columns = EXPORT_COLUMNS[model]
+    stmt = select(*(getattr(model, c) for c in columns)).where(*where).order_by(model.id)
+    # Core rows rather than ORM results: nothing here needs identity tracking
+    result = db.session.connection().execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for batch in result.partitions():
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for batch in result.partitions():
+            yield ''.join(
+                json.dumps({c: _json_value(v) for c, v in zip(columns, row)}) + '\n' for row in batch
+            )
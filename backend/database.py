@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import event, inspect
+
+from metrics import DB_QUERIES, DB_TIME
+from models import db
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PRAGMAS = (
+    # Readers don't block the writer (and vice versa) in WAL mode
+    ('journal_mode', 'WAL'),
+    # Safe with WAL; only the last commits can be lost on power failure
+    ('synchronous', 'NORMAL'),
+    # Negative values are KiB: ~20 MB page cache per connection
+    ('cache_size', '-20000'),
+    # Wait for a competing writer instead of failing with "database is locked"
+    ('busy_timeout', '5000'),
+    ('temp_store', 'MEMORY'),
+)
+
+# Ordered (version, description, function(connection)) steps applied to
+# databases created by an older version of the app. New databases are
+# created from the models and stamped with the latest version directly.
+def _create_indexes(table_name, *index_names):
+    def apply(conn):
+        for index in db.metadata.tables[table_name].indexes:
+            if index.name in index_names:
+                index.create(conn, checkfirst=True)
+    return apply
+
+
+def _merge_duplicate_stock_picks(conn):
+    # Fold each group into its first row: mention counts add up, user lists
+    # are joined and the latest last_updated wins; other columns keep the first row's values
+    same_pick = 'd.ticker = stock_pick.ticker AND d.source = stock_pick.source AND d.date IS stock_pick.date'
+    conn.exec_driver_sql(
+        'UPDATE stock_pick SET '
+        f'mention_count = (SELECT SUM(COALESCE(d.mention_count, 1)) FROM stock_pick AS d WHERE {same_pick}), '
+        f'twitter_users = (SELECT GROUP_CONCAT(d.twitter_users) FROM stock_pick AS d WHERE {same_pick}), '
+        f'last_updated = (SELECT MAX(d.last_updated) FROM stock_pick AS d WHERE {same_pick}) '
+        'WHERE id IN (SELECT MIN(id) FROM stock_pick GROUP BY ticker, source, date HAVING COUNT(*) > 1)'
+    )
+    merged = [row_id for (row_id,) in conn.exec_driver_sql(
+        'SELECT id FROM stock_pick WHERE id NOT IN '
+        '(SELECT MIN(id) FROM stock_pick GROUP BY ticker, source, date) ORDER BY id'
+    )]
+    if merged:
+        logger.warning(
+            f"Merged {len(merged)} duplicate stock picks into the first pick of the same "
+            f"ticker, source and day; removed ids: {merged}"
+        )
+        conn.exec_driver_sql(
+            'DELETE FROM stock_pick WHERE id NOT IN '
+            '(SELECT MIN(id) FROM stock_pick GROUP BY ticker, source, date)'
+        )
+
+
+def _unique_stock_picks(conn):
+    # Tables created before the constraint existed can hold several rows per
+    # ticker/source/day; merge them so the unique index builds
+    constraints = {c['name'] for c in inspect(conn).get_unique_constraints('stock_pick')}
+    if 'uq_stock_pick_ticker_source_date' not in constraints:
+        _merge_duplicate_stock_picks(conn)
+        conn.exec_driver_sql(
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_pick_ticker_source_date '
+            'ON stock_pick (ticker, source, date)'
+        )
+    _create_indexes('stock_pick', 'ix_stock_pick_source_date')(conn)
+
+MIGRATIONS = [
+    (1, 'baseline schema', lambda conn: db.metadata.create_all(conn)),
+    (2, 'trade history pagination indexes',
+     _create_indexes('trade_history', 'ix_trade_history_date_closed', 'ix_trade_history_ticker')),
+    (3, 'shared worker state', lambda conn: db.metadata.tables['shared_state'].create(conn, checkfirst=True)),
+    (4, 'ticker sector classification',
+     lambda conn: db.metadata.tables['ticker_sector'].create(conn, checkfirst=True)),
+    (5, 'one stock pick per ticker, source and day', _unique_stock_picks),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def configure_sqlite(engine):
+    if engine.dialect.name != 'sqlite':
+        return
+    if not event.contains(engine, 'connect', _set_pragmas):
+        event.listen(engine, 'connect', _set_pragmas)
+        # Connections opened before the listener existed don't have the pragmas
+        engine.dispose()
+
+
+# Statement count and time for the request running on this thread
+_query_scope = threading.local()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = getattr(_query_scope, 'stats', None)
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def install_query_metrics(engine):
+    if not event.contains(engine, 'after_cursor_execute', _after_execute):
+        event.listen(engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine, 'after_cursor_execute', _after_execute)
+
+
+def begin_query_scope():
+    _query_scope.stats = [0, 0.0]
+
+
+def end_query_scope(route):
+    # Records what ran on this thread since begin_query_scope(); returns (statements, seconds)
+    stats = getattr(_query_scope, 'stats', None)
+    if stats is None:
+        return None
+    _query_scope.stats = None
+    DB_QUERIES.observe(stats[0], route=route)
+    DB_TIME.observe(stats[1], route=route)
+    return stats[0], stats[1]
+
+
+def schema_version(conn):
+    return conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def migrate(engine):
+    """Bring the schema up to date without touching existing data."""
+    with engine.begin() as conn:
+        version = schema_version(conn)
+        existing_tables = set(engine.dialect.get_table_names(conn))
+
+        if version == 0 and not existing_tables:
+            db.metadata.create_all(conn)
+            conn.exec_driver_sql(f'PRAGMA user_version={LATEST_VERSION}')
+            logger.info(f"Created database schema at version {LATEST_VERSION}")
+            return
+
+        for step, description, apply in MIGRATIONS:
+            if step <= version:
+                continue
+            logger.info(f"Applying migration {step}: {description}")
+            apply(conn)
+            conn.exec_driver_sql(f'PRAGMA user_version={step}')
+
+        if version < LATEST_VERSION:
+            logger.info(f"Database schema migrated from version {version} to {LATEST_VERSION}")
@@ -0,0 +1,34 @@
+"""gunicorn settings for serving the Flask app from several worker processes.
+
+    gunicorn app:app -c gunicorn.conf.py
+
+Every worker starts the background refresher, and the refresh leader lease
+in the shared state backend makes sure only one of them talks to yfinance
+and Twitter. The others serve the quotes it persists. Multiple workers need
+a backend they all see, so sqlite is the default here instead of memory.
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault('STATE_BACKEND', 'sqlite')
+
+bind = f"{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', 5001)}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threaded workers: every open /stream client holds a thread
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+timeout = 60
+
+
+def post_worker_init(worker):
+    from app import start_background_jobs
+    start_background_jobs()
+
+
+def worker_exit(server, worker):
+    # Hand the lease over right away instead of letting it expire
+    from app import refresher
+    refresher.stop()
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+
+import requests
+
+try:
+    from yfinance import exceptions as yf_exceptions
+except ImportError:  # Older yfinance releases raise plain exceptions only
+    yf_exceptions = None
+
+logger = logging.getLogger(__name__)
+
+# Error kinds
+RATE_LIMITED = 'rate_limited'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+AUTH = 'auth'
+TRANSIENT = 'transient'
+# Problems with what was asked for rather than with the upstream itself
+CALLER_ERRORS = (NOT_FOUND, INVALID)
+
+
+def _yf_errors(*names):
+    return tuple(getattr(yf_exceptions, name) for name in names if hasattr(yf_exceptions, name))
+
+
+YF_RATE_LIMIT_ERRORS = _yf_errors('YFRateLimitError')
+YF_NOT_FOUND_ERRORS = _yf_errors('YFTickerMissingError', 'YFPricesMissingError', 'YFTzMissingError')
+
+
+class UpstreamError(Exception):
+    """An upstream call that failed for a known reason."""
+
+    def __init__(self, kind, message='', retry_after=None):
+        super().__init__(message or kind)
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, name, retry_after):
+        super().__init__(TRANSIENT, f"{name} circuit open", retry_after)
+
+
+def classify_status(status_code):
+    if status_code == 429:
+        return RATE_LIMITED
+    if status_code in (401, 403):
+        return AUTH
+    if status_code == 404:
+        return NOT_FOUND
+    if status_code == 400:
+        return INVALID
+    return TRANSIENT
+
+
+def classify_error(error):
+    """Map an exception from yfinance or requests to an error kind."""
+    if isinstance(error, UpstreamError):
+        return error.kind
+    if YF_RATE_LIMIT_ERRORS and isinstance(error, YF_RATE_LIMIT_ERRORS):
+        return RATE_LIMITED
+    if YF_NOT_FOUND_ERRORS and isinstance(error, YF_NOT_FOUND_ERRORS):
+        return NOT_FOUND
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return classify_status(error.response.status_code)
+    return TRANSIENT
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream is down instead of waiting on every call.
+
+    Opens after `failure_threshold` consecutive failures (or at once on a
+    rate limit) and stays open for `reset_timeout` seconds. Then a single
+    trial call is let through: success closes it, failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60, clock=time.time):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.open_until = None
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self.clock() >= self.open_until:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        # Like allow(), but raises so callers can treat it as any other failure
+        if not self.allow():
+            raise CircuitOpenError(self.name, max(self.open_until - self.clock(), 0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"{self.name} circuit closed")
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self, kind=TRANSIENT, retry_after=None):
+        # Only upstream-wide problems count; a bad symbol says nothing about the service
+        if kind in CALLER_ERRORS:
+            with self._lock:
+                self._trial_running = False
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or kind in (RATE_LIMITED, AUTH) or self.failures >= self.failure_threshold:
+                self._open(retry_after)
+            self._trial_running = False
+
+    def _open(self, retry_after):
+        now = self.clock()
+        self.state = 'open'
+        self.opened_at = now
+        self.open_until = now + max(self.reset_timeout, retry_after or 0)
+        logger.warning(f"{self.name} circuit open for {self.open_until - now:.0f} seconds")
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'open_until': self.open_until if self.state != 'closed' else None,
+                'rejected': self.rejected
+            }
+
+
+class TickerHealth:
+    """Negative cache of symbols that keep failing.
+
+    A symbol the upstream says doesn't exist is skipped for `bad_ttl`
+    seconds. Other failures only block it after `failure_threshold`
+    consecutive misses, for a period that doubles up to `bad_ttl`.
+    """
+
+    def __init__(self, bad_ttl=3600 * 6, failure_threshold=3, retry_after=300, clock=time.time):
+        self.bad_ttl = bad_ttl
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def is_blocked(self, ticker):
+        with self._lock:
+            entry = self._entries.get(ticker)
+            return entry is not None and entry['blocked_until'] > self.clock()
+
+    def partition(self, tickers):
+        # (allowed, blocked) in input order
+        now = self.clock()
+        with self._lock:
+            blocked = {t for t in tickers if t in self._entries and self._entries[t]['blocked_until'] > now}
+        return [t for t in tickers if t not in blocked], [t for t in tickers if t in blocked]
+
+    def record_success(self, ticker):
+        with self._lock:
+            self._entries.pop(ticker, None)
+
+    def record_failure(self, ticker, kind):
+        if kind in (RATE_LIMITED, AUTH):
+            return  # The upstream's fault, not the symbol's
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.setdefault(ticker, {'failures': 0, 'kind': kind, 'blocked_until': 0})
+            entry['failures'] += 1
+            entry['kind'] = kind
+            if kind in CALLER_ERRORS:
+                entry['blocked_until'] = now + self.bad_ttl
+            elif entry['failures'] >= self.failure_threshold:
+                strikes = entry['failures'] - self.failure_threshold
+                entry['blocked_until'] = now + min(self.retry_after * 2 ** strikes, self.bad_ttl)
+            if entry['blocked_until'] > now:
+                logger.warning(f"Skipping {ticker} for {entry['blocked_until'] - now:.0f} seconds ({kind})")
+
+    def clear(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ticker, None)
+
+    def status(self):
+        now = self.clock()
+        with self._lock:
+            return {
+                ticker: {
+                    'kind': entry['kind'],
+                    'failures': entry['failures'],
+                    'blocked_for': round(entry['blocked_until'] - now)
+                }
+                for ticker, entry in self._entries.items() if entry['blocked_until'] > now
+            }
@@ -0,0 +1,48 @@
+"""Logging setup: plain text by default, or one JSON object per line.
+
+Hot-path messages pass extra=SAMPLED (plus any structured fields); below
+WARNING only a LOG_SAMPLE_RATE fraction of them is emitted.
+"""
+import json
+import logging
+import random
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+SAMPLED = {'sampled': True}
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sampled'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, rate, rng=random.random):
+        super().__init__()
+        self.rate = rate
+        self.rng = rng
+
+    def filter(self, record):
+        if getattr(record, 'sampled', False) and record.levelno < logging.WARNING:
+            return self.rate >= 1 or self.rng() < self.rate
+        return True
+
+
+def configure_logging(level='INFO', structured=False, sample_rate=1.0):
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if structured else logging.Formatter(TEXT_FORMAT))
+    handler.addFilter(SampleFilter(sample_rate))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
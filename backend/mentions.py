@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import db, Mention
+
+# Windows accepted by /picks?window=
+MENTION_WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+}
+
+
+def _split_users(value):
+    return sorted(value.split(',')) if value else []
+
+
+def top_mentioned(window, limit=20):
+    """Tickers with the most mentions over the trailing window, busiest first."""
+    since = datetime.utcnow() - window
+    mention_count = func.count(Mention.id).label('mention_count')
+    rows = (
+        db.session.query(
+            Mention.ticker,
+            mention_count,
+            func.count(Mention.username.distinct()).label('user_count'),
+            func.group_concat(Mention.username.distinct()).label('users'),
+            func.max(Mention.created_at).label('last_mentioned')
+        )
+        .filter(Mention.created_at >= since)
+        .group_by(Mention.ticker)
+        .order_by(mention_count.desc(), Mention.ticker)
+        .limit(limit)
+    )
+    return [{
+        'ticker': row.ticker,
+        'mention_count': row.mention_count,
+        'user_count': row.user_count,
+        'twitter_users': _split_users(row.users),
+        'last_mentioned': row.last_mentioned.isoformat() if row.last_mentioned else None
+    } for row in rows]
+
+
+def users_by_ticker_day(tickers, start_date, end_date):
+    """{(ticker, date): [users]} for mentions between two dates, inclusive."""
+    if not tickers:
+        return {}
+    day = func.date(Mention.created_at)
+    rows = (
+        db.session.query(Mention.ticker, day, func.group_concat(Mention.username.distinct()))
+        .filter(
+            Mention.ticker.in_(tickers),
+            Mention.created_at >= datetime.combine(start_date, datetime.min.time()),
+            Mention.created_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        )
+        .group_by(Mention.ticker, day)
+    )
+    return {
+        (ticker, datetime.strptime(date, '%Y-%m-%d').date()): _split_users(users)
+        for ticker, date, users in rows
+    }
@@ -0,0 +1,171 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Metrics are module-level objects that instrumented code updates directly;
+GET /metrics renders every registered metric. Callback gauges read values
+other components already keep (cache stats, rate-limit waits) at scrape time.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import math
+import threading
+import time
+
+# Seconds; upstream calls and SQLite queries span sub-millisecond to tens of seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, help, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels(self.labelnames, key, [('le', _number(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """A gauge (or counter) whose values are read from `collect` at scrape time.
+
+    `collect` returns {label values tuple: value}, or a bare number when the
+    metric has no labels.
+    """
+
+    def __init__(self, name, help, collect, labelnames=(), kind='gauge', registry=REGISTRY):
+        self.collect = collect
+        self.kind = kind
+        super().__init__(name, help, labelnames, registry)
+
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f'{self.name}{_labels(self.labelnames, key)} {_number(value)}'
+            for key, value in values.items() if value is not None
+        ]
+
+
+# Shared metrics; instrumented modules import the ones they update
+ROUTE_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent serving a request', ['route', 'method', 'status']
+)
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', 'Latency of calls to yfinance and the Twitter API', ['upstream', 'call']
+)
+UPSTREAM_ERRORS = Counter(
+    'upstream_errors_total', 'Failed upstream calls by classified error kind', ['upstream', 'call', 'kind']
+)
+RETRY_SLEEP = Counter(
+    'upstream_retry_sleep_seconds_total', 'Time spent sleeping before retrying an upstream call', ['upstream']
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request', 'SQL statements executed per request or background job', ['route'],
+    buckets=COUNT_BUCKETS
+)
+DB_TIME = Histogram(
+    'db_query_seconds_per_request', 'Time spent in SQL statements per request or background job', ['route']
+)
+TWEETS_SCANNED = Counter('twitter_tweets_scanned_total', 'New tweets scanned for cashtags')
+TICKERS_EXTRACTED = Counter('twitter_tickers_extracted_total', 'Ticker mentions extracted from tweets')
@@ -0,0 +1,93 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+
+db = SQLAlchemy()
+
+# Database Models
+class StockPick(db.Model):
+    __table_args__ = (
+        # One row per ticker/source/day; AI mention counts are upserted into it
+        db.UniqueConstraint('ticker', 'source', 'date', name='uq_stock_pick_ticker_source_date'),
+        db.Index('ix_stock_pick_source_date', 'source', 'date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    ticker = db.Column(db.String(10), nullable=False)
+    source = db.Column(db.String(10), nullable=False)  # AI or Manual
+    date = db.Column(db.Date, default=datetime.utcnow)
+    mention_count = db.Column(db.Integer, default=1)
+    twitter_users = db.Column(db.String(500))  # Comma-separated users supplied with manual picks; AI pick users come from Mention
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    position_type = db.Column(db.String(10))  # long or short, only for manual picks
+
+class Position(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ticker = db.Column(db.String(10), nullable=False)
+    entry_price = db.Column(db.Float, nullable=False)
+    exit_price = db.Column(db.Float, nullable=True)  # Null if not exited
+    status = db.Column(db.String(10), nullable=False)  # long, short, or closed
+    performance = db.Column(db.Float, nullable=True)  # Percentage gain/loss
+    
+class TradeHistory(db.Model):
+    __table_args__ = (
+        # Keyset pagination over the trade journal (?sort=-date_closed, ?ticker=)
+        db.Index('ix_trade_history_date_closed', 'date_closed', 'id'),
+        db.Index('ix_trade_history_ticker', 'ticker'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    ticker = db.Column(db.String(10), nullable=False)
+    entry_price = db.Column(db.Float, nullable=False)
+    exit_price = db.Column(db.Float, nullable=False)
+    performance = db.Column(db.Float, nullable=False)
+    date_closed = db.Column(db.Date, default=datetime.utcnow)
+
+class TwitterAccount(db.Model):
+    # Username -> user ID mapping, resolved once since IDs never change
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(50), nullable=False, unique=True)  # Lowercased
+    user_id = db.Column(db.String(32), nullable=True)  # Null if the username doesn't exist
+    resolved_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_tweet_id = db.Column(db.String(32), nullable=True)  # Newest tweet ingested, used as since_id
+
+class ProcessedTweet(db.Model):
+    # Every tweet counted towards mentions, so a tweet is never counted twice
+    tweet_id = db.Column(db.String(32), primary_key=True)
+    username = db.Column(db.String(50), nullable=False)
+    processed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Mention(db.Model):
+    # One row per ticker per tweet; counts and user sets are aggregated in SQL
+    __table_args__ = (
+        db.UniqueConstraint('tweet_id', 'ticker', name='uq_mention_tweet_ticker'),
+        db.Index('ix_mention_ticker_created_at', 'ticker', 'created_at'),
+        db.Index('ix_mention_created_at', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    ticker = db.Column(db.String(10), nullable=False)
+    username = db.Column(db.String(50), nullable=False)
+    tweet_id = db.Column(db.String(32), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)  # Tweet time, naive UTC
+
+class QuoteSnapshot(db.Model):
+    # Last known quote per ticker, served immediately after a restart
+    ticker = db.Column(db.String(10), primary_key=True)
+    current_price = db.Column(db.Float, nullable=True)
+    daily_change = db.Column(db.Float, nullable=True)
+    last_close = db.Column(db.Float, nullable=True)
+    fetched_at = db.Column(db.Float, nullable=False)  # Unix timestamp of the upstream fetch
+
+class SharedState(db.Model):
+    # Refresh leader lease and watchlists, shared by every worker process
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.Float, nullable=True)  # Unix timestamp; null never expires
+
+class TickerSector(db.Model):
+    # Sector/industry classification used for the /sectors aggregates
+    ticker = db.Column(db.String(10), primary_key=True)
+    sector = db.Column(db.String(50), nullable=False)
+    industry = db.Column(db.String(100), nullable=True)
+    shares_outstanding = db.Column(db.Float, nullable=True)  # Market cap = shares x current price
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
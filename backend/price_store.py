@@ -0,0 +1,184 @@
+from datetime import datetime, time as dtime, timedelta
+import logging
+import os
+import re
+import tempfile
+
+import numpy as np
+import yfinance as yf
+
+from health import classify_error
+from metrics import UPSTREAM_ERRORS, UPSTREAM_LATENCY
+from quote_cache import MARKET_TZ
+
+logger = logging.getLogger(__name__)
+
+# Daily bars are final shortly after the close; earlier ones may still move
+SESSION_SETTLED = dtime(16, 30)
+# History fetched the first time a ticker is seen
+INITIAL_PERIOD = '1y'
+TOP_UP_CHUNK_SIZE = 100
+
+# One record per daily bar; files are plain .npy so they can be memory-mapped
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+])
+
+EMPTY_BARS = np.empty(0, dtype=BAR_DTYPE)
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9._-]')
+
+
+def _to_day(value):
+    return np.datetime64(value, 'D')
+
+
+def settled_through(now=None):
+    """Latest weekday whose daily bar is final (today only after the close)."""
+    now = now or datetime.now(MARKET_TZ)
+    day = now.date()
+    if now.time() < SESSION_SETTLED:
+        day -= timedelta(days=1)
+    return np.busday_offset(_to_day(day), 0, roll='backward').astype(object)
+
+
+def bars_from_frame(frame):
+    """Convert a yfinance history/download frame (Date index, OHLCV columns) to bars."""
+    if frame is None or frame.empty:
+        return EMPTY_BARS
+    frame = frame.dropna(subset=['Close'])
+    bars = np.empty(len(frame), dtype=BAR_DTYPE)
+    index = frame.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    bars['date'] = index.values.astype('datetime64[D]')
+    for field, column in (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'), ('volume', 'Volume')):
+        bars[field] = frame[column].to_numpy(dtype=float) if column in frame else np.nan
+    return bars
+
+
+class PriceStore:
+    """On-disk daily price history, one memory-mapped .npy file per ticker."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ticker):
+        return os.path.join(self.root, _UNSAFE_FILENAME.sub('_', ticker) + '.npy')
+
+    def tickers(self):
+        return sorted(name[:-4] for name in os.listdir(self.root) if name.endswith('.npy'))
+
+    def read(self, ticker):
+        # Read-only memory map: callers slice it without loading the whole file
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return EMPTY_BARS
+        return np.load(path, mmap_mode='r')
+
+    def write(self, ticker, bars):
+        # Sorted by date, one bar per date (later bars win), replaced atomically
+        bars = np.asarray(bars, dtype=BAR_DTYPE)
+        if len(bars):
+            order = np.argsort(bars['date'], kind='stable')[::-1]
+            _, first = np.unique(bars['date'][order], return_index=True)
+            bars = bars[order][first]
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, bars)
+            os.replace(tmp, self.path(ticker))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def last_date(self, ticker):
+        bars = self.read(ticker)
+        return bars['date'][-1].astype(object) if len(bars) else None
+
+    def range(self, ticker, start=None, end=None):
+        """Bars with start <= date <= end (either bound optional), as a slice of the map."""
+        bars = self.read(ticker)
+        lo = np.searchsorted(bars['date'], _to_day(start), side='left') if start else 0
+        hi = np.searchsorted(bars['date'], _to_day(end), side='right') if end else len(bars)
+        return bars[lo:hi]
+
+    def previous_close(self, ticker, before):
+        # Close of the last stored session strictly before `before`
+        bars = self.read(ticker)
+        i = np.searchsorted(bars['date'], _to_day(before), side='left')
+        return float(bars['close'][i - 1]) if i > 0 else None
+
+    def append(self, ticker, new_bars):
+        if not len(new_bars):
+            return 0
+        existing = self.read(ticker)
+        self.write(ticker, np.concatenate([np.asarray(existing), new_bars]))
+        return len(new_bars)
+
+    def top_up(self, tickers, downloader=yf.download, chunk_size=TOP_UP_CHUNK_SIZE, now=None, breaker=None):
+        """Fetch only the bars after each ticker's last stored date.
+
+        Tickers sharing a last date (the common case) are downloaded together.
+        Bars for sessions that haven't settled yet are never stored.
+        Returns {ticker: bars added}.
+        """
+        through = settled_through(now)
+        groups = {}
+        for ticker in tickers:
+            last = self.last_date(ticker)
+            if last is not None and last >= through:
+                continue
+            groups.setdefault(last, []).append(ticker)
+
+        added = {}
+        for last, group in groups.items():
+            for i in range(0, len(group), chunk_size):
+                chunk = group[i:i + chunk_size]
+                kwargs = {'period': INITIAL_PERIOD} if last is None else {'start': last + timedelta(days=1)}
+                if breaker is not None and not breaker.allow():
+                    return added
+                try:
+                    with UPSTREAM_LATENCY.time(upstream='yfinance', call='download_history'):
+                        data = downloader(
+                            chunk,
+                            interval='1d',
+                            group_by='ticker',
+                            auto_adjust=False,
+                            progress=False,
+                            threads=True,
+                            **kwargs
+                        )
+                except Exception as e:
+                    logger.error(f"History top-up failed for {len(chunk)} tickers: {str(e)}")
+                    kind = classify_error(e)
+                    UPSTREAM_ERRORS.inc(upstream='yfinance', call='download_history', kind=kind)
+                    if breaker is not None:
+                        breaker.record_failure(kind)
+                    continue
+                if breaker is not None:
+                    breaker.record_success()
+                for ticker in chunk:
+                    frame = _ticker_frame(data, ticker, len(chunk))
+                    bars = bars_from_frame(frame)
+                    bars = bars[bars['date'] <= _to_day(through)]
+                    if last is not None:
+                        bars = bars[bars['date'] > _to_day(last)]
+                    added[ticker] = self.append(ticker, bars)
+        return added
+
+
+def _ticker_frame(data, ticker, chunk_len):
+    # group_by='ticker' gives (ticker, field) columns; flat for one symbol on older yfinance
+    if data is None or data.empty:
+        return None
+    if hasattr(data.columns, 'levels'):
+        if ticker not in data.columns.get_level_values(0):
+            return None
+        return data[ticker]
+    return data if chunk_len == 1 else None
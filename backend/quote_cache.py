@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from datetime import datetime, time as dtime, UTC
+from zoneinfo import ZoneInfo
+import threading
+import time
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+
+EMPTY_QUOTE = {
+    'current_price': None,
+    'daily_change': None,
+    'last_close': None
+}
+
+
+def is_market_open(now=None):
+    # Regular US session only, holidays are treated as trading days
+    now = now or datetime.now(MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+class QuoteCache:
+    """Process-wide, TTL-bounded LRU cache of quotes keyed by ticker.
+
+    Concurrent misses for the same ticker are coalesced so only one caller
+    goes upstream while the others wait for its result.
+    """
+
+    def __init__(self, max_size=1000, market_ttl=60, closed_ttl=900, clock=time.time):
+        self.max_size = max_size
+        self.market_ttl = market_ttl
+        self.closed_ttl = closed_ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # ticker -> (quote, fetched_at)
+        self._inflight = {}  # ticker -> threading.Event
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def ttl(self):
+        return self.market_ttl if is_market_open() else self.closed_ttl
+
+    def _fresh(self, ticker, now, ttl):
+        entry = self._entries.get(ticker)
+        if entry is None or now - entry[1] > ttl:
+            return None
+        self._entries.move_to_end(ticker)
+        return entry[0]
+
+    def _store(self, ticker, quote, now):
+        self._entries[ticker] = (quote, now)
+        self._entries.move_to_end(ticker)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, tickers, fetch):
+        """Return {ticker: quote}, calling fetch(list_of_tickers) for misses."""
+        result = {}
+        to_fetch = []
+        to_wait = {}
+        now = self.clock()
+        ttl = self.ttl()
+
+        with self._lock:
+            for ticker in dict.fromkeys(tickers):
+                quote = self._fresh(ticker, now, ttl)
+                if quote is not None:
+                    self.hits += 1
+                    result[ticker] = quote
+                elif ticker in self._inflight:
+                    self.coalesced += 1
+                    to_wait[ticker] = self._inflight[ticker]
+                else:
+                    self.misses += 1
+                    self._inflight[ticker] = threading.Event()
+                    to_fetch.append(ticker)
+
+        if to_fetch:
+            fetched = {}
+            try:
+                fetched = fetch(to_fetch) or {}
+            finally:
+                now = self.clock()
+                with self._lock:
+                    for ticker in to_fetch:
+                        quote = fetched.get(ticker)
+                        # Failed lookups are not cached so the next request retries
+                        if quote is not None and quote.get('current_price') is not None:
+                            self._store(ticker, quote, now)
+                        self._inflight.pop(ticker).set()
+            result.update(fetched)
+
+        for ticker, event in to_wait.items():
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(ticker)
+            result[ticker] = entry[0] if entry else dict(EMPTY_QUOTE)
+
+        return result
+
+    def snapshot(self, tickers):
+        """Return whatever is stored for tickers, however old, without fetching."""
+        result = {}
+        with self._lock:
+            for ticker in tickers:
+                entry = self._entries.get(ticker)
+                if entry is None:
+                    continue
+                quote, fetched_at = entry
+                result[ticker] = dict(quote, as_of=datetime.fromtimestamp(fetched_at, UTC).isoformat())
+        return result
+
+    def entries_since(self, timestamp):
+        # {ticker: (quote, fetched_at)} for entries stored after timestamp
+        with self._lock:
+            return {
+                ticker: entry for ticker, entry in self._entries.items()
+                if entry[1] > timestamp
+            }
+
+    def prime(self, entries):
+        # Load previously persisted (quote, fetched_at) pairs, keeping their age
+        with self._lock:
+            for ticker, (quote, fetched_at) in entries.items():
+                current = self._entries.get(ticker)
+                if current is None or current[1] < fetched_at:
+                    self._store(ticker, quote, fetched_at)
+
+    def invalidate(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ticker, None)
+
+    def stats(self):
+        now = self.clock()
+        with self._lock:
+            ages = [now - fetched_at for _, fetched_at in self._entries.values()]
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl(),
+                'market_open': is_market_open(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.coalesced) / lookups if lookups else None,
+                'inflight': len(self._inflight),
+                'oldest_age': max(ages) if ages else None,
+                'average_age': sum(ages) / len(ages) if ages else None,
+            }
@@ -0,0 +1,265 @@
+from datetime import datetime
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from health import RATE_LIMITED, TRANSIENT, CircuitOpenError, UpstreamError, classify_error
+from log_config import SAMPLED
+from metrics import RETRY_SLEEP, UPSTREAM_ERRORS, UPSTREAM_LATENCY
+from quote_cache import MARKET_TZ
+
+logger = logging.getLogger(__name__)
+
+# Symbols per bulk download; yfinance splits each call into its own threads
+BULK_CHUNK_SIZE = 100
+
+
+def empty_quote():
+    return {
+        'current_price': None,
+        'daily_change': None,
+        'last_close': None
+    }
+
+
+def _close_frame(data, tickers):
+    # yf.download returns (field, ticker) columns for several symbols and,
+    # depending on the yfinance version, flat columns for a single one
+    if data is None or data.empty:
+        return pd.DataFrame(columns=tickers, dtype=float)
+    if isinstance(data.columns, pd.MultiIndex):
+        closes = data['Close']
+    else:
+        closes = data[['Close']].rename(columns={'Close': tickers[0]})
+    return closes.apply(pd.to_numeric, errors='coerce')
+
+
+def quotes_from_closes(closes):
+    """Compute current price, previous close and daily change for every column.
+
+    `closes` is a date-indexed frame with one column per ticker. Each column
+    may have gaps (halted or newly listed symbols), so the last and
+    second-to-last *valid* closes are picked per column without a Python loop.
+    """
+    valid = closes.notna()
+    position = valid.cumsum()
+    count = position.iloc[-1] if len(closes) else pd.Series(0, index=closes.columns)
+
+    current = closes.where(valid & position.eq(count, axis=1)).max()
+    previous = closes.where(valid & position.eq(count - 1, axis=1)).max()
+    change = (current - previous) / previous * 100
+
+    quotes = {}
+    for ticker, price, last_close, daily_change in zip(closes.columns, current, previous, change):
+        if pd.isna(price):
+            continue
+        quotes[ticker] = {
+            'current_price': float(price),
+            'daily_change': None if pd.isna(daily_change) else float(daily_change),
+            'last_close': None if pd.isna(last_close) else float(last_close)
+        }
+    return quotes
+
+
+def quotes_with_stored_close(closes, price_store):
+    """Quotes from the latest bar only, with the previous close read locally.
+
+    The previous close is the last stored close before the bar's own date,
+    so weekends and holidays still compare against the right session.
+    """
+    if closes.empty:
+        return {}
+    latest = closes.ffill().iloc[-1]
+    has_bar = closes.notna()
+    bar_dates = has_bar[::-1].idxmax()  # Date of each column's last valid close
+
+    quotes = {}
+    for ticker, price in latest.items():
+        if pd.isna(price):
+            continue
+        last_close = price_store.previous_close(ticker, pd.Timestamp(bar_dates[ticker]).date())
+        quotes[ticker] = {
+            'current_price': float(price),
+            'daily_change': float((price - last_close) / last_close * 100) if last_close else None,
+            'last_close': last_close
+        }
+    return quotes
+
+
+def previous_session(now=None):
+    """Weekday before the latest session; holidays aren't known, so it may be one early."""
+    now = now or datetime.now(MARKET_TZ)
+    return np.busday_offset(np.datetime64(now.date(), 'D'), -1, roll='backward').astype(object)
+
+
+def fetch_bulk_quotes(tickers, downloader=yf.download, chunk_size=BULK_CHUNK_SIZE, price_store=None, breaker=None,
+                      now=None):
+    # Symbols stored through the previous session only need the latest bar;
+    # the rest (no history, or a gap the top-up hasn't filled yet) need a few
+    # sessions so the change isn't taken against an older close
+    stored = set()
+    if price_store is not None:
+        since = previous_session(now)
+        stored = {t for t in tickers if (last := price_store.last_date(t)) is not None and last >= since}
+    with_history = [t for t in tickers if t in stored]
+    without_history = [t for t in tickers if t not in stored]
+
+    quotes = {}
+    for group, period in ((with_history, '1d'), (without_history, '5d')):
+        for i in range(0, len(group), chunk_size):
+            quotes.update(_download_quotes(group[i:i + chunk_size], period, downloader, price_store, breaker))
+    return quotes
+
+
+def _download_quotes(chunk, period, downloader, price_store, breaker):
+    if breaker is not None and not breaker.allow():
+        return {}
+    try:
+        with UPSTREAM_LATENCY.time(upstream='yfinance', call='download'):
+            data = downloader(
+                chunk,
+                period=period,
+                interval='1d',
+                group_by='column',
+                auto_adjust=False,
+                prepost=False,
+                progress=False,
+                threads=True
+            )
+    except Exception as e:
+        logger.error(f"Bulk download failed for {len(chunk)} tickers: {str(e)}")
+        kind = classify_error(e)
+        UPSTREAM_ERRORS.inc(upstream='yfinance', call='download', kind=kind)
+        if breaker is not None:
+            breaker.record_failure(kind)
+        return {}
+    if breaker is not None:
+        breaker.record_success()
+    closes = _close_frame(data, chunk)
+    if period == '1d':
+        return quotes_with_stored_close(closes, price_store)
+    return quotes_from_closes(closes)
+
+
+def _single_quote(ticker, stock):
+    # First try to get fast_info data (most reliable and efficient)
+    try:
+        with UPSTREAM_LATENCY.time(upstream='yfinance', call='fast_info'):
+            fast_info = stock.fast_info
+            current_price = fast_info['lastPrice']
+            last_close = fast_info['previousClose']
+        price_change = ((current_price - last_close) / last_close) * 100
+        return {
+            'current_price': current_price,
+            'daily_change': price_change,
+            'last_close': last_close
+        }
+    except Exception as e:
+        kind = classify_error(e)
+        UPSTREAM_ERRORS.inc(upstream='yfinance', call='fast_info', kind=kind)
+        if kind == RATE_LIMITED:
+            raise
+        logger.warning(f"Fast info failed for {ticker}, trying history: {str(e)}")
+
+    # If fast_info fails, try historical data
+    # raise_errors surfaces why there's no data (unknown symbol vs network);
+    # without it yfinance logs the error and returns an empty frame
+    with UPSTREAM_LATENCY.time(upstream='yfinance', call='history'):
+        hist = stock.history(period='2d', interval='1d', prepost=False, raise_errors=True)
+    if len(hist) < 1:
+        raise UpstreamError(TRANSIENT, f"No price data for {ticker}")
+    current_or_last = float(hist['Close'].iloc[-1])
+    price_change = 0
+
+    if len(hist) >= 2:
+        yesterday_close = float(hist['Close'].iloc[-2])
+        price_change = ((current_or_last - yesterday_close) / yesterday_close) * 100
+
+    return {
+        'current_price': current_or_last,
+        'daily_change': price_change,
+        'last_close': current_or_last
+    }
+
+
+def fetch_single_quote(ticker, ticker_factory=yf.Ticker, retries=3, delay=2, sleep=time.sleep, breaker=None):
+    """Look up one symbol, retrying transient failures with backoff.
+
+    Raises UpstreamError carrying the kind of the last failure. Unknown
+    symbols and rate limits are not retried, and CircuitOpenError is raised
+    without calling out while the yfinance breaker is open.
+    """
+    kind = TRANSIENT
+    for attempt in range(retries):
+        if breaker is not None:
+            breaker.check()
+        try:
+            quote = _single_quote(ticker, ticker_factory(ticker))
+        except Exception as e:
+            kind = classify_error(e)
+            logger.error(f"Error fetching data for {ticker} (attempt {attempt + 1}, {kind}): {str(e)}")
+            if breaker is not None:
+                breaker.record_failure(kind)
+            if kind != TRANSIENT:
+                break
+            # No point waiting if the failure just opened the breaker
+            if attempt < retries - 1 and (breaker is None or breaker.state == 'closed'):
+                RETRY_SLEEP.inc(delay * (2 ** attempt), upstream='yfinance')
+                sleep(delay * (2 ** attempt))
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return quote
+
+    raise UpstreamError(kind, f"Failed to fetch data for {ticker}")
+
+
+def fetch_quotes(tickers, downloader=yf.download, ticker_factory=yf.Ticker, chunk_size=BULK_CHUNK_SIZE,
+                 price_store=None, health=None, breaker=None, sleep=time.sleep):
+    """Fetch quotes for all tickers in as few upstream calls as possible.
+
+    Returns {ticker: {'current_price', 'daily_change', 'last_close'}} with
+    None values for symbols that could not be resolved at all. Symbols the
+    health registry is currently skipping are returned empty without a call.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+
+    allowed, skipped = health.partition(tickers) if health is not None else (tickers, [])
+    stock_data = fetch_bulk_quotes(
+        allowed, downloader=downloader, chunk_size=chunk_size, price_store=price_store, breaker=breaker
+    )
+    if health is not None:
+        for ticker in stock_data:
+            health.record_success(ticker)
+
+    # Only symbols missing from the bulk result pay for a per-symbol lookup
+    missing = [t for t in allowed if t not in stock_data]
+    if missing:
+        logger.info(
+            f"Falling back to per-symbol lookup for {len(missing)} tickers",
+            extra=dict(SAMPLED, tickers=len(missing))
+        )
+    for ticker in missing:
+        try:
+            stock_data[ticker] = fetch_single_quote(
+                ticker, ticker_factory=ticker_factory, sleep=sleep, breaker=breaker
+            )
+        except CircuitOpenError:
+            stock_data[ticker] = empty_quote()
+            continue
+        except UpstreamError as e:
+            stock_data[ticker] = empty_quote()
+            if health is not None:
+                health.record_failure(ticker, e.kind)
+            continue
+        if health is not None:
+            health.record_success(ticker)
+
+    for ticker in skipped:
+        stock_data[ticker] = empty_quote()
+    return stock_data
@@ -0,0 +1,264 @@
+from datetime import datetime, UTC
+import asyncio
+import logging
+import threading
+import time
+
+from database import begin_query_scope, end_query_scope
+
+logger = logging.getLogger(__name__)
+
+
+class Watchlist:
+    """Tickers requested by clients that are not otherwise tracked in the DB.
+
+    Entries expire when nobody has asked for them for `ttl` seconds so the
+    refresher stops paying for symbols no dashboard is showing any more.
+    """
+
+    def __init__(self, ttl=3600, max_size=500, clock=time.time):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def touch(self, tickers):
+        # Returns the tickers that were not being watched before
+        now = self.clock()
+        added = []
+        with self._lock:
+            for ticker in tickers:
+                if ticker not in self._seen:
+                    added.append(ticker)
+                self._seen[ticker] = now
+            if len(self._seen) > self.max_size:
+                oldest = sorted(self._seen, key=self._seen.get)
+                for ticker in oldest[:len(self._seen) - self.max_size]:
+                    del self._seen[ticker]
+        return added
+
+    def tickers(self):
+        cutoff = self.clock() - self.ttl
+        with self._lock:
+            for ticker in [t for t, seen in self._seen.items() if seen < cutoff]:
+                del self._seen[ticker]
+            return list(self._seen)
+
+
+class Job:
+    def __init__(self, name, interval, func, follower=None):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        # Run instead of func on workers that aren't the refresh leader
+        self.follower = follower
+        self.wakeup = threading.Event()
+        self.thread = None
+        # Set when the job is driven from an event loop (run_async)
+        self.loop = None
+        self.async_wakeup = None
+        self.task = None
+        self.runs = 0
+        self.failures = 0
+        self.last_started = None
+        self.last_finished = None
+        self.last_duration = None
+        self.last_error = None
+        self.role = None
+
+    def status(self):
+        return {
+            'interval': self.interval,
+            'role': self.role,
+            'running': (self.thread is not None and self.thread.is_alive())
+            or (self.task is not None and not self.task.done()),
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_started': self.last_started,
+            'last_finished': self.last_finished,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error
+        }
+
+
+class BackgroundRefresher:
+    """Runs periodic market-data jobs off the request threads.
+
+    Every job gets its own daemon thread so a long Twitter rate-limit wait
+    can't hold up quote refreshes. Jobs run inside an app context so they
+    can use the database session.
+
+    With several worker processes, pass a LeaderLease: only the worker
+    holding it runs the jobs; the others run each job's `follower`
+    function, if it has one, and skip it otherwise.
+    """
+
+    def __init__(self, app, leader=None):
+        self.app = app
+        self.leader = leader
+        self.jobs = {}
+        self._stopping = threading.Event()
+        self._lease_thread = None
+        self._lease_loop = None
+        self._lease_wakeup = None
+
+    def add_job(self, name, interval, func, follower=None):
+        self.jobs[name] = Job(name, interval, func, follower)
+
+    def start(self):
+        if self.leader is not None and (self._lease_thread is None or not self._lease_thread.is_alive()):
+            # Take the lease before the first job runs, then keep renewing it
+            self.leader.renew()
+            self._lease_thread = threading.Thread(target=self._keep_lease, name='refresher-lease', daemon=True)
+            self._lease_thread.start()
+        for job in self.jobs.values():
+            if job.thread is not None and job.thread.is_alive():
+                continue
+            job.thread = threading.Thread(
+                target=self._run_forever,
+                args=(job,),
+                name=f'refresher-{job.name}',
+                daemon=True
+            )
+            job.thread.start()
+        logger.info(f"Background refresher started with jobs: {', '.join(self.jobs)}")
+
+    def stop(self):
+        self._stopping.set()
+        for job in self.jobs.values():
+            self._wake(job)
+        if self._lease_loop is not None:
+            self._lease_loop.call_soon_threadsafe(self._lease_wakeup.set)
+        if self.leader is not None:
+            # Let another worker take over without waiting for the lease to lapse
+            self.leader.release()
+
+    def _renew_lease(self):
+        if self.leader.renew():
+            # Newly promoted: run the upstream jobs now rather than at the next interval
+            for job in self.jobs.values():
+                self._wake(job)
+
+    def _keep_lease(self):
+        while not self._stopping.wait(self.leader.renew_interval):
+            self._renew_lease()
+
+    def _wake(self, job):
+        job.wakeup.set()
+        if job.loop is not None:
+            job.loop.call_soon_threadsafe(job.async_wakeup.set)
+
+    def trigger(self, name):
+        # Ask a job to run now instead of waiting for its next interval
+        job = self.jobs.get(name)
+        if job is None:
+            return False
+        self._wake(job)
+        return True
+
+    def run_once(self, name):
+        self._run(self.jobs[name])
+
+    def _job_func(self, job):
+        if self.leader is None:
+            return job.func
+        if self.leader.is_leader:
+            job.role = 'leader'
+            return job.func
+        job.role = 'follower'
+        return job.follower
+
+    def _run(self, job):
+        func = self._job_func(job)
+        if func is None:
+            return
+        job.last_started = datetime.now(UTC).isoformat()
+        started = time.perf_counter()
+        begin_query_scope()
+        try:
+            with self.app.app_context():
+                func()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.exception(f"Background job {job.name} failed")
+        finally:
+            end_query_scope(f'job:{job.name}')
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            job.last_finished = datetime.now(UTC).isoformat()
+
+    def _run_forever(self, job):
+        while not self._stopping.is_set():
+            job.wakeup.clear()
+            self._run(job)
+            job.wakeup.wait(job.interval)
+
+    async def run_async(self, executor, coroutines=None):
+        """Drive every job from the running event loop instead of threads.
+
+        Plain job functions run on `executor`, which bounds how many of them
+        can block on upstream I/O at once. `coroutines` maps a job name to a
+        coroutine function that replaces that job's function.
+        """
+        loop = asyncio.get_running_loop()
+        coroutines = coroutines or {}
+        for job in self.jobs.values():
+            job.loop = loop
+            job.async_wakeup = asyncio.Event()
+        tasks = []
+        if self.leader is not None:
+            self._lease_loop = loop
+            self._lease_wakeup = asyncio.Event()
+            await loop.run_in_executor(executor, self.leader.renew)
+            tasks.append(asyncio.create_task(self._keep_lease_async(executor), name='refresher-lease'))
+        for job in self.jobs.values():
+            job.task = asyncio.create_task(
+                self._run_forever_async(job, executor, coroutines.get(job.name)),
+                name=f'refresher-{job.name}'
+            )
+            tasks.append(job.task)
+        logger.info(f"Background refresher started on the event loop with jobs: {', '.join(self.jobs)}")
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _keep_lease_async(self, executor):
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._lease_wakeup.wait(), self.leader.renew_interval)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(executor, self._renew_lease)
+
+    async def _run_forever_async(self, job, executor, coroutine):
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            job.async_wakeup.clear()
+            func = self._job_func(job)
+            if coroutine is not None and func is job.func:
+                await self._record_async(job, coroutine)
+            elif func is not None:
+                await loop.run_in_executor(executor, self._run, job)
+            try:
+                await asyncio.wait_for(job.async_wakeup.wait(), job.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _record_async(self, job, coroutine):
+        job.last_started = datetime.now(UTC).isoformat()
+        started = time.perf_counter()
+        try:
+            await coroutine()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.exception(f"Background job {job.name} failed")
+        finally:
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            job.last_finished = datetime.now(UTC).isoformat()
+
+    def status(self):
+        return {name: job.status() for name, job in self.jobs.items()}
@@ -0,0 +1,211 @@
+"""Ticker -> sector/industry classification and precomputed sector aggregates.
+
+Classifications live in the TickerSector table. They are seeded from an
+optional CSV (ticker,sector,industry,shares_outstanding) and filled in for
+other tracked tickers from yfinance in small batches. After every quote
+refresh, SectorAggregates recomputes per-sector (and per-industry) figures
+and keeps the serialized response, so GET /sectors costs the same however
+many tickers a sector has.
+"""
+from datetime import datetime, UTC
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import yfinance as yf
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from health import classify_error
+from metrics import UPSTREAM_ERRORS, UPSTREAM_LATENCY
+from models import db, TickerSector
+
+logger = logging.getLogger(__name__)
+
+GROUPINGS = ('sector', 'industry')
+TOP_MOVERS = 5
+SAVE_CHUNK_SIZE = 500
+UNCLASSIFIED = 'Unclassified'
+
+
+def _float_or_none(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def read_sector_file(path):
+    """Rows from a ticker,sector,industry[,shares_outstanding] CSV, or [] if it doesn't exist."""
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as f:
+        return [{
+            'ticker': row['ticker'].strip().upper(),
+            'sector': row['sector'].strip() or UNCLASSIFIED,
+            'industry': (row.get('industry') or '').strip() or None,
+            'shares_outstanding': _float_or_none(row.get('shares_outstanding'))
+        } for row in csv.DictReader(f) if row.get('ticker') and row.get('sector')]
+
+
+def save_classifications(rows):
+    if not rows:
+        return
+    now = datetime.now(UTC).replace(tzinfo=None)
+    # Chunked to stay under SQLite's bound-parameter limit for large seed files
+    for start in range(0, len(rows), SAVE_CHUNK_SIZE):
+        chunk = rows[start:start + SAVE_CHUNK_SIZE]
+        stmt = sqlite_insert(TickerSector).values([dict(row, updated_at=now) for row in chunk])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['ticker'],
+            set_={
+                'sector': stmt.excluded.sector,
+                'industry': stmt.excluded.industry,
+                'shares_outstanding': stmt.excluded.shares_outstanding,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+    db.session.commit()
+
+
+def unclassified(tickers):
+    known = {t for (t,) in db.session.query(TickerSector.ticker).filter(TickerSector.ticker.in_(tickers))}
+    return [t for t in tickers if t not in known]
+
+
+def fetch_classifications(tickers, ticker_factory=yf.Ticker, breaker=None, health=None):
+    """Look up sector, industry and share count for each ticker.
+
+    One `info` request per ticker, so callers pass a small batch. Symbols
+    yfinance has no sector for (ETFs, indexes) are stored as Unclassified
+    so they aren't looked up again.
+    """
+    rows = []
+    for ticker in tickers:
+        if breaker is not None and not breaker.allow():
+            break
+        try:
+            with UPSTREAM_LATENCY.time(upstream='yfinance', call='info'):
+                info = ticker_factory(ticker).info or {}
+        except Exception as e:
+            kind = classify_error(e)
+            UPSTREAM_ERRORS.inc(upstream='yfinance', call='info', kind=kind)
+            logger.warning(f"Sector lookup failed for {ticker}: {str(e)}")
+            if breaker is not None:
+                breaker.record_failure(kind)
+            if health is not None:
+                health.record_failure(ticker, kind)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        if health is not None:
+            health.record_success(ticker)
+        rows.append({
+            'ticker': ticker,
+            'sector': info.get('sector') or UNCLASSIFIED,
+            'industry': info.get('industry'),
+            'shares_outstanding': _float_or_none(info.get('sharesOutstanding'))
+        })
+    return rows
+
+
+def _movers(tickers, changes, order):
+    return [{'ticker': tickers[i], 'daily_change': float(changes[i])} for i in order]
+
+
+def summarize(tickers, changes, caps):
+    """Aggregate one group; `changes` and `caps` are aligned float arrays (NaN = unknown)."""
+    priced = ~np.isnan(changes)
+    group = {
+        'tickers': len(tickers),
+        'priced': int(priced.sum()),
+        'equal_weighted_change': None,
+        'cap_weighted_change': None,
+        'advancers': int((changes[priced] > 0).sum()),
+        'decliners': int((changes[priced] < 0).sum()),
+        'unchanged': int((changes[priced] == 0).sum()),
+        'top_gainers': [],
+        'top_losers': []
+    }
+    if not priced.any():
+        return group
+    group['equal_weighted_change'] = float(changes[priced].mean())
+    weighted = priced & ~np.isnan(caps) & (caps > 0)
+    if weighted.any():
+        group['cap_weighted_change'] = float(np.average(changes[weighted], weights=caps[weighted]))
+
+    index = np.flatnonzero(priced)
+    order = index[np.argsort(changes[index], kind='stable')]
+    group['top_gainers'] = _movers(tickers, changes, [i for i in order[::-1][:TOP_MOVERS] if changes[i] > 0])
+    group['top_losers'] = _movers(tickers, changes, [i for i in order[:TOP_MOVERS] if changes[i] < 0])
+    return group
+
+
+class SectorAggregates:
+    """Per-sector and per-industry aggregates over the latest quotes.
+
+    `update` runs on the refresh job and swaps in a fully built snapshot;
+    readers only ever see a complete one. The classification map is
+    reloaded from the database when the table changes.
+    """
+
+    def __init__(self):
+        self.members = {}  # ticker -> (sector, industry, shares_outstanding)
+        self._table_version = None
+        self._snapshots = {grouping: None for grouping in GROUPINGS}
+        self._lock = threading.Lock()
+
+    def reload(self):
+        # Cheap change check so the whole table is only read after it was written
+        version = tuple(db.session.query(func.count(TickerSector.ticker), func.max(TickerSector.updated_at)).one())
+        if version == self._table_version:
+            return
+        self.members = {
+            row.ticker: (row.sector, row.industry or UNCLASSIFIED, row.shares_outstanding)
+            for row in TickerSector.query
+        }
+        self._table_version = version
+
+    def tickers(self):
+        return list(self.members)
+
+    def update(self, quotes):
+        """Recompute every group from {ticker: quote}; tickers without a quote count as unpriced."""
+        members = self.members
+        tickers = list(members)
+        changes = np.full(len(tickers), np.nan)
+        caps = np.full(len(tickers), np.nan)
+        for i, ticker in enumerate(tickers):
+            quote = quotes.get(ticker)
+            if not quote:
+                continue
+            change, price = quote.get('daily_change'), quote.get('current_price')
+            if change is not None:
+                changes[i] = change
+            shares = members[ticker][2]
+            if price is not None and shares:
+                caps[i] = price * shares
+
+        as_of = datetime.now(UTC).isoformat()
+        for position, grouping in enumerate(GROUPINGS):
+            labels = np.array([members[t][position] for t in tickers], dtype=object)
+            groups = {}
+            for label in sorted(set(labels)):
+                index = np.flatnonzero(labels == label)
+                groups[label] = summarize([tickers[i] for i in index], changes[index], caps[index])
+            body = json.dumps({'as_of': as_of, 'by': grouping, 'groups': groups}).encode()
+            # ETag over the figures only, so an unchanged market still gets 304s
+            etag = hashlib.sha1(json.dumps(groups, sort_keys=True).encode()).hexdigest()
+            snapshot = (body, etag)
+            with self._lock:
+                self._snapshots[grouping] = snapshot
+
+    def snapshot(self, grouping='sector'):
+        """(serialized JSON body, etag) of the latest aggregates, or None before the first update."""
+        with self._lock:
+            return self._snapshots[grouping]
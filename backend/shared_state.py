@@ -0,0 +1,240 @@
+"""State shared by every worker process: the refresh leader and watchlists.
+
+Backends store short string values with an optional expiry and offer one
+atomic primitive, `acquire(key, owner, ttl)`: take the key if it is free or
+expired, or extend it if `owner` already holds it. The leader lease is
+built on it.
+
+- MemoryStateBackend: a single process (also handy with an injected clock)
+- SqliteStateBackend: a table in the app database, shared by local workers
+- RedisStateBackend: any Redis-compatible server, for workers on several hosts
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+try:
+    import redis
+except ImportError:  # Only needed for STATE_BACKEND=redis
+    redis = None
+
+from models import SharedState
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStateBackend:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, self.clock())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, self.clock() + ttl if ttl else None)
+
+    def acquire(self, key, owner, ttl):
+        with self._lock:
+            now = self.clock()
+            entry = self._live(key, now)
+            if entry is not None and entry[0] != owner:
+                return False
+            self._entries[key] = (owner, now + ttl)
+            return True
+
+    def release(self, key, owner):
+        with self._lock:
+            entry = self._live(key, self.clock())
+            if entry is not None and entry[0] == owner:
+                del self._entries[key]
+
+    def scan(self, prefix):
+        with self._lock:
+            now = self.clock()
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            return {key: entry[0] for key in keys if (entry := self._live(key, now))}
+
+
+class SqliteStateBackend:
+    """Keys in the shared_state table; every statement is a single atomic upsert/read."""
+
+    def __init__(self, engine, clock=time.time):
+        self.engine = engine
+        self.clock = clock
+        self.table = SharedState.__table__
+
+    def _unexpired(self, now):
+        return (self.table.c.expires_at.is_(None)) | (self.table.c.expires_at > now)
+
+    def get(self, key):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(self.table.c.value).where(self.table.c.key == key, self._unexpired(self.clock()))
+            ).scalar()
+
+    def set(self, key, value, ttl=None):
+        expires_at = self.clock() + ttl if ttl else None
+        stmt = sqlite_insert(self.table).values(key=key, value=value, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'value': stmt.excluded.value, 'expires_at': stmt.excluded.expires_at}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def acquire(self, key, owner, ttl):
+        now = self.clock()
+        stmt = sqlite_insert(self.table).values(key=key, value=owner, expires_at=now + ttl)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'value': stmt.excluded.value, 'expires_at': stmt.excluded.expires_at},
+            # Only when free: held by us already, or the previous holder's time is up
+            where=(self.table.c.value == owner) | ~self._unexpired(now)
+        )
+        with self.engine.begin() as conn:
+            return conn.execute(stmt).rowcount == 1
+
+    def release(self, key, owner):
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key, self.table.c.value == owner))
+
+    def scan(self, prefix):
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.table.c.key, self.table.c.value).where(
+                    self.table.c.key.like(f'{escaped}%', escape='\\'), self._unexpired(self.clock())
+                )
+            )
+            return dict(rows.all())
+
+
+class RedisStateBackend:
+    # Take the key if free or already ours, in one round trip
+    _ACQUIRE = """
+    local current = redis.call('get', KEYS[1])
+    if current == false or current == ARGV[1] then
+        redis.call('set', KEYS[1], ARGV[1], 'px', ARGV[2])
+        return 1
+    end
+    return 0
+    """
+    _RELEASE = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url, namespace='semitrader:'):
+        if redis is None:
+            raise RuntimeError("STATE_BACKEND=redis needs the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.namespace = namespace
+        self._acquire = self.client.register_script(self._ACQUIRE)
+        self._release = self.client.register_script(self._RELEASE)
+
+    def get(self, key):
+        return self.client.get(self.namespace + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.namespace + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def acquire(self, key, owner, ttl):
+        return bool(self._acquire(keys=[self.namespace + key], args=[owner, int(ttl * 1000)]))
+
+    def release(self, key, owner):
+        self._release(keys=[self.namespace + key], args=[owner])
+
+    def scan(self, prefix):
+        keys = list(self.client.scan_iter(match=self.namespace + prefix + '*'))
+        if not keys:
+            return {}
+        start = len(self.namespace)
+        return {key[start:]: value for key, value in zip(keys, self.client.mget(keys)) if value is not None}
+
+
+def create_backend(kind, engine=None, url=None):
+    if kind == 'memory':
+        return MemoryStateBackend()
+    if kind == 'sqlite':
+        return SqliteStateBackend(engine)
+    if kind == 'redis':
+        return RedisStateBackend(url)
+    raise ValueError(f"Unknown STATE_BACKEND {kind!r} (expected memory, sqlite or redis)")
+
+
+def worker_id():
+    # Unique per process, readable in /health
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class LeaderLease:
+    """Time-limited leadership: the holder must renew before `ttl` runs out.
+
+    `is_leader` is answered locally from the last successful renewal, so
+    job threads can check it without a round trip to the backend.
+    """
+
+    def __init__(self, backend, key='refresh_leader', ttl=60, owner=None, clock=time.time):
+        self.backend = backend
+        self.key = key
+        self.ttl = ttl
+        self.owner = owner or worker_id()
+        self.clock = clock
+        self.held_until = 0
+        # Renewed a third of the way in, so a slow renewal doesn't drop the lease
+        self.renew_interval = ttl / 3
+
+    @property
+    def is_leader(self):
+        return self.clock() < self.held_until
+
+    def renew(self):
+        """Acquire or extend the lease; True if this worker became leader just now."""
+        was_leader = self.is_leader
+        started = self.clock()
+        try:
+            acquired = self.backend.acquire(self.key, self.owner, self.ttl)
+        except Exception as e:
+            # Can't prove we still hold it: step down when the lease would have lapsed
+            logger.warning(f"Could not renew refresh leadership: {str(e)}")
+            return False
+        self.held_until = started + self.ttl if acquired else 0
+        if acquired != was_leader:
+            logger.info(f"Worker {self.owner} {'is now' if acquired else 'is no longer'} the refresh leader")
+        return acquired and not was_leader
+
+    def release(self):
+        if self.held_until:
+            self.held_until = 0
+            try:
+                self.backend.release(self.key, self.owner)
+            except Exception as e:
+                logger.warning(f"Could not release refresh leadership: {str(e)}")
+
+    def status(self):
+        return {
+            'owner': self.owner,
+            'leader': self.is_leader,
+            'held_until': self.held_until or None,
+            'current_leader': self.backend.get(self.key)
+        }
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import threading
+
+
+def compact_quote(quote):
+    # Short keys keep the per-tick payload small: price, change, as_of
+    return {
+        'p': quote.get('current_price'),
+        'c': quote.get('daily_change'),
+        't': quote.get('as_of')
+    }
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    def __init__(self, tickers):
+        # None means every ticker
+        self.tickers = set(tickers) if tickers else None
+        self.pending = {}
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+    def wants(self, ticker):
+        return self.tickers is None or ticker in self.tickers
+
+    def push(self, deltas):
+        with self.lock:
+            for ticker, quote in deltas.items():
+                if self.wants(ticker):
+                    self.pending[ticker] = quote
+            if self.pending:
+                self.ready.set()
+                self._notify()
+
+    def _notify(self):
+        pass
+
+    def wait(self, timeout):
+        # Returns the deltas accumulated since the last call, or {} on timeout.
+        # A slow client never builds a backlog: newer ticks overwrite older ones.
+        self.ready.wait(timeout)
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.ready.clear()
+        return pending
+
+
+class AsyncSubscription(Subscription):
+    """A Subscription an event-loop task can await without holding a thread.
+
+    push() is called from the refresher's threads, so the loop is woken
+    with call_soon_threadsafe.
+    """
+
+    def __init__(self, tickers, loop):
+        super().__init__(tickers)
+        self.loop = loop
+        self.async_ready = asyncio.Event()
+
+    def _notify(self):
+        self.loop.call_soon_threadsafe(self.async_ready.set)
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self.async_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.ready.clear()
+            self.async_ready.clear()
+        return pending
+
+
+class QuoteBroadcaster:
+    """Fans a single server-side quote refresh out to every SSE client.
+
+    Only tickers whose price or change moved since the previous publish are
+    sent, and each client only receives the tickers it subscribed to.
+    """
+
+    def __init__(self):
+        self._latest = {}
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, tickers=None, loop=None):
+        # With an event loop the subscription is awaited via stream_async
+        subscription = AsyncSubscription(tickers, loop) if loop is not None else Subscription(tickers)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def snapshot(self, subscription):
+        with self._lock:
+            return {t: q for t, q in self._latest.items() if subscription.wants(t)}
+
+    def publish(self, quotes):
+        deltas = {}
+        with self._lock:
+            for ticker, quote in quotes.items():
+                compact = compact_quote(quote)
+                previous = self._latest.get(ticker)
+                if previous and previous['p'] == compact['p'] and previous['c'] == compact['c']:
+                    continue
+                self._latest[ticker] = compact
+                deltas[ticker] = compact
+            subscriptions = list(self._subscriptions)
+        if deltas:
+            for subscription in subscriptions:
+                subscription.push(deltas)
+        return deltas
+
+    def client_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def stream(self, subscription, initial=None, heartbeat=15, on_heartbeat=None):
+        """Generator of SSE frames for one client: snapshot, then deltas."""
+        try:
+            yield 'retry: 5000\n\n'
+            yield sse_event('snapshot', initial if initial is not None else self.snapshot(subscription))
+            while True:
+                deltas = subscription.wait(heartbeat)
+                if deltas:
+                    yield sse_event('quotes', deltas)
+                else:
+                    if on_heartbeat:
+                        on_heartbeat()
+                    yield ': heartbeat\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stream_async(self, subscription, initial=None, heartbeat=15, on_heartbeat=None):
+        """Async generator twin of stream() for AsyncSubscription clients."""
+        try:
+            yield 'retry: 5000\n\n'
+            yield sse_event('snapshot', initial if initial is not None else self.snapshot(subscription))
+            while True:
+                deltas = await subscription.wait_async(heartbeat)
+                if deltas:
+                    yield sse_event('quotes', deltas)
+                else:
+                    if on_heartbeat:
+                        on_heartbeat()
+                    yield ': heartbeat\n\n'
+        finally:
+            self.unsubscribe(subscription)
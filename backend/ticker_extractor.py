@@ -0,0 +1,102 @@
+import csv
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# A cashtag is "$" + 1-5 letters with an optional class-share suffix
+# ($BRK.B, $BF/B), not preceded by a word character or another "$" and not
+# running into more word characters ($100, US$AAPL and $AAPLX123 don't match).
+# The lookbehind sits after the literal "$" so the regex engine can scan for
+# "$" directly instead of testing the lookbehind at every position.
+CASHTAG_PATTERN = re.compile(r'\$(?<![\w$]\$)([A-Za-z]{1,5}(?:[./][A-Za-z]{1,2})?)(?!\w)')
+SHARE_CLASS_SEPARATOR = re.compile(r'[./]')
+
+# NASDAQ Trader's daily directory of symbols traded on US exchanges; load_symbols reads it as is
+LISTING_URL = 'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt'
+
+# Cashtags that are almost always currencies rather than listed symbols
+DEFAULT_STOPWORDS = frozenset({
+    'USD', 'EUR', 'GBP', 'JPY', 'CAD', 'AUD', 'CHF', 'CNY', 'HKD', 'NZD', 'MXN'
+})
+
+
+def normalize_symbol(symbol):
+    # Yahoo writes class shares with a dash: BRK.B / BRK/B -> BRK-B
+    return SHARE_CLASS_SEPARATOR.sub('-', symbol.strip().upper())
+
+
+def load_symbols(path):
+    """Load listed symbols from a local listing file.
+
+    Accepts NASDAQ Trader's pipe-delimited nasdaqtraded.txt/otherlisted.txt
+    (a header row with a "Symbol" or "ACT Symbol" column) as well as plain
+    files with one symbol per line or a symbol in the first CSV column.
+    """
+    symbols = set()
+    with open(path, newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if '|' in first:
+            for row in csv.DictReader(f, delimiter='|'):
+                symbol = row.get('Symbol') or row.get('ACT Symbol') or row.get('NASDAQ Symbol')
+                if not symbol or symbol.startswith('File Creation Time'):
+                    continue
+                if row.get('Test Issue') == 'Y':
+                    continue
+                symbols.add(normalize_symbol(symbol))
+        else:
+            for row in csv.reader(f):
+                if row and row[0].strip() and not row[0].startswith('#'):
+                    symbols.add(normalize_symbol(row[0]))
+    symbols.discard('SYMBOL')
+    return frozenset(symbols)
+
+
+class TickerExtractor:
+    """Extracts cashtags from tweet text.
+
+    With a symbol set, candidates (including lowercase cashtags) are kept
+    only if they are listed. Without one, only uppercase cashtags that
+    aren't stopwords are kept, which matches the old behaviour.
+    """
+
+    def __init__(self, symbols=None, stopwords=DEFAULT_STOPWORDS):
+        self.symbols = symbols
+        self.stopwords = stopwords
+
+    @classmethod
+    def from_listing(cls, path):
+        if path and os.path.exists(path):
+            symbols = load_symbols(path)
+            logger.info(f"Loaded {len(symbols)} listed symbols from {path}")
+            return cls(symbols)
+        logger.error(
+            f"Symbol listing {path} not found: cashtag validation is OFF. Lowercase cashtags are "
+            f"dropped and unlisted ones such as $AI are counted as picks. Download {LISTING_URL} "
+            "to that path (or set SYMBOL_LISTING_FILE to a copy) and restart."
+        )
+        return cls()
+
+    def extract(self, text):
+        # Unique symbols in order of first appearance
+        if '$' not in text:
+            return []
+        found = {}
+        symbols = self.symbols
+        stopwords = self.stopwords
+        for raw in CASHTAG_PATTERN.findall(text):
+            if symbols is None and not raw.isupper():
+                continue
+            symbol = raw.upper() if raw.isalpha() else normalize_symbol(raw)
+            if symbol in stopwords:
+                continue
+            if symbols is not None and symbol not in symbols:
+                continue
+            found[symbol] = None
+        return list(found)
+
+    def extract_batch(self, texts):
+        extract = self.extract
+        return [extract(text) for text in texts]
@@ -0,0 +1,416 @@
+import asyncio
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # Only needed for the ASGI serving mode
+    httpx = None
+
+from health import AUTH, CALLER_ERRORS, RATE_LIMITED, TRANSIENT, CircuitBreaker, classify_status
+from metrics import RETRY_SLEEP, UPSTREAM_ERRORS, UPSTREAM_LATENCY
+
+logger = logging.getLogger(__name__)
+
+TWITTER_API_BASE = 'https://api.twitter.com/2'
+USERS_PER_LOOKUP = 100  # Max usernames accepted by GET /2/users/by
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+
+class TokenBucket:
+    """Client-side budget for one Twitter endpoint, shared across threads.
+
+    Until the API has told us anything it refills smoothly at
+    capacity/window. Once x-rate-limit-* headers have been seen it mirrors
+    the server's fixed window: `remaining` tokens until `reset`, then full.
+    """
+
+    def __init__(self, capacity, window=900, clock=time.time, sleep=time.sleep):
+        self.capacity = capacity
+        self.window = window
+        self.tokens = float(capacity)
+        self.reset_at = None
+        self.clock = clock
+        self.sleep = sleep
+        self.waited = 0.0
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.reset_at is not None:
+            if now >= self.reset_at:
+                self.tokens = float(self.capacity)
+                self.reset_at = None
+        else:
+            rate = self.capacity / self.window
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def reserve(self):
+        # Takes a token and returns 0, or returns how long to wait for one
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            if self.reset_at is not None:
+                wait = max(self.reset_at - now, 1)
+            else:
+                wait = (1 - self.tokens) * self.window / self.capacity
+        logger.info(f"Rate limit budget exhausted, waiting {wait:.0f} seconds...")
+        self.waited += wait
+        return wait
+
+    def acquire(self):
+        while (wait := self.reserve()) > 0:
+            self.sleep(wait)
+
+    async def acquire_async(self):
+        while (wait := self.reserve()) > 0:
+            await asyncio.sleep(wait)
+
+    def update(self, limit=None, remaining=None, reset=None):
+        with self._lock:
+            if limit:
+                self.capacity = limit
+            if remaining is None or reset is None:
+                return
+            if self.reset_at is None or reset > self.reset_at:
+                # A new server window: its remaining count is authoritative
+                self.tokens = float(remaining)
+            else:
+                # Responses from concurrent workers arrive out of order
+                self.tokens = min(self.tokens, float(remaining))
+            self.reset_at = reset
+            self._updated = self.clock()
+
+    def update_from_headers(self, headers):
+        def header(name):
+            value = headers.get(name)
+            return int(value) if value is not None and str(value).isdigit() else None
+
+        self.update(
+            limit=header('x-rate-limit-limit'),
+            remaining=header('x-rate-limit-remaining'),
+            reset=header('x-rate-limit-reset')
+        )
+
+    def exhaust(self, reset):
+        # Called on a 429: nothing left until the server window resets
+        with self._lock:
+            self.tokens = 0.0
+            self.reset_at = reset
+
+    def status(self):
+        with self._lock:
+            return {
+                'limit': self.capacity,
+                'remaining': int(self.tokens),
+                'reset_at': self.reset_at,
+                'rate_limit_wait_seconds': self.waited
+            }
+
+
+class RetryPolicy:
+    """Decides whether and when a failed Twitter call is retried.
+
+    Rate limits wait until the server's x-rate-limit-reset (through the
+    endpoint's token bucket); other transient failures back off
+    exponentially. Unknown users, bad requests and auth errors are final.
+    """
+
+    def __init__(self, retries=3, base_delay=1.0, max_delay=30.0, rate_limit_fallback=60, clock=time.time):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_fallback = rate_limit_fallback
+        self.clock = clock
+
+    def rate_limited_until(self, headers):
+        # Honor the server's reset time; guess a window only if it's missing or stale
+        value = headers.get('x-rate-limit-reset')
+        now = self.clock()
+        reset = int(value) if value is not None and str(value).isdigit() else 0
+        return reset if reset > now else now + self.rate_limit_fallback
+
+    def delay(self, kind, attempt, breaker):
+        # Seconds to wait before the next attempt, or None to give up
+        if kind in CALLER_ERRORS or kind == AUTH:
+            return None  # Retrying won't change the answer
+        if attempt >= self.retries - 1:
+            return None
+        if kind == RATE_LIMITED:
+            return 0  # The bucket does the waiting
+        if breaker.state != 'closed':
+            return None
+        return min(self.base_delay * 2 ** attempt, self.max_delay)
+
+
+class EndpointStats:
+    """Call count, failures and latency for one Twitter endpoint."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, status_code):
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if status_code == 429:
+                self.rate_limited += 1
+            elif status_code != 200:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'rate_limited': self.rate_limited,
+                'average_seconds': self.total_seconds / self.calls if self.calls else None,
+                'max_seconds': self.max_seconds
+            }
+
+
+class TwitterClient:
+    """Twitter API v2 client shared by every ingestion worker.
+
+    Requests go through one keep-alive Session whose connection pool is
+    sized for the worker count, with connect/read timeouts on every call.
+    """
+
+    def __init__(self, bearer_token, users_limit=300, tweets_limit=1500, window=900,
+                 api_base=TWITTER_API_BASE, breaker=None, retry=None,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, clock=time.time, sleep=time.sleep):
+        self.api_base = api_base
+        self.breaker = breaker or CircuitBreaker('twitter', clock=clock)
+        self.retry = retry or RetryPolicy(clock=clock)
+        self.sleep = sleep
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.headers = {
+            'Authorization': f'Bearer {bearer_token}',
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip, deflate'
+        }
+        self.buckets = {
+            'users': TokenBucket(users_limit, window, clock=clock, sleep=sleep),
+            'tweets': TokenBucket(tweets_limit, window, clock=clock, sleep=sleep)
+        }
+        self.endpoint_stats = {name: EndpointStats() for name in self.buckets}
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def stats(self):
+        # Per endpoint: latency and outcomes, plus what's left of the rate-limit window
+        return {
+            name: dict(self.endpoint_stats[name].snapshot(), **bucket.status())
+            for name, bucket in self.buckets.items()
+        }
+
+    def _outcome(self, bucket_name, path, response, seconds):
+        """Book-keep one response. Returns (payload, error kind or None)."""
+        bucket = self.buckets[bucket_name]
+        bucket.update_from_headers(response.headers)
+        self.endpoint_stats[bucket_name].observe(seconds, response.status_code)
+        UPSTREAM_LATENCY.observe(seconds, upstream='twitter', call=bucket_name)
+        if response.status_code == 200:
+            payload = response.json()
+            self.breaker.record_success()
+            return payload, None
+        if response.status_code == 429:
+            # The bucket waits out the window; this isn't an outage
+            reset_time = self.retry.rate_limited_until(response.headers)
+            logger.warning(f"Rate limited on {path}, backing off until {reset_time:.0f}")
+            bucket.exhaust(reset_time)
+            self.breaker.record_success()  # Reachable, just out of budget
+            UPSTREAM_ERRORS.inc(upstream='twitter', call=bucket_name, kind=RATE_LIMITED)
+            return None, RATE_LIMITED
+        kind = classify_status(response.status_code)
+        UPSTREAM_ERRORS.inc(upstream='twitter', call=bucket_name, kind=kind)
+        logger.error(f"Error calling {path} ({kind}): {response.status_code} {response.text}")
+        self.breaker.record_failure(kind)
+        return None, kind
+
+    def _failed(self, bucket_name, path, error, seconds):
+        logger.error(f"Exception calling {path}: {str(error)}")
+        self.endpoint_stats[bucket_name].observe(seconds, None)
+        UPSTREAM_LATENCY.observe(seconds, upstream='twitter', call=bucket_name)
+        UPSTREAM_ERRORS.inc(upstream='twitter', call=bucket_name, kind=TRANSIENT)
+        self.breaker.record_failure(TRANSIENT)
+        return None, TRANSIENT
+
+    def _get(self, bucket_name, path, params=None):
+        bucket = self.buckets[bucket_name]
+        for attempt in range(self.retry.retries):
+            if not self.breaker.allow():
+                logger.warning(f"Twitter circuit open, skipping {path}")
+                return None
+            bucket.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.get(f'{self.api_base}{path}', params=params, timeout=self.timeout)
+                payload, kind = self._outcome(bucket_name, path, response, time.perf_counter() - started)
+            except Exception as e:
+                payload, kind = self._failed(bucket_name, path, e, time.perf_counter() - started)
+            if kind is None:
+                return payload
+            sleep_time = self.retry.delay(kind, attempt, self.breaker)
+            if sleep_time is None:
+                break
+            if sleep_time:
+                logger.info(f"Retrying in {sleep_time} seconds...")
+                RETRY_SLEEP.inc(sleep_time, upstream='twitter')
+                self.sleep(sleep_time)
+        return None
+
+    def lookup_user_ids(self, usernames):
+        """Resolve usernames in bulk.
+
+        Returns {lowercased username: id or None}. Names that don't exist map
+        to None; names from chunks whose request failed are left out.
+        """
+        ids = {}
+        for i in range(0, len(usernames), USERS_PER_LOOKUP):
+            chunk = usernames[i:i + USERS_PER_LOOKUP]
+            payload = self._get('users', '/users/by', params={'usernames': ','.join(chunk)})
+            if payload is None:
+                continue
+            ids.update((name.lower(), None) for name in chunk)
+            for user in payload.get('data', []):
+                ids[user['username'].lower()] = user['id']
+        return ids
+
+    def get_user_tweets(self, user_id, params, max_pages=10):
+        """Fetch a timeline, following next_token until exhausted or max_pages.
+
+        Returns (tweets, newest_id) where newest_id is the newest tweet ID
+        the API reported for the query, or None if nothing new was returned,
+        a page failed or max_pages ran out before the last page.
+        """
+        tweets = []
+        newest_id = None
+        params = dict(params)
+        for _ in range(max_pages):
+            payload = self._get('tweets', f'/users/{user_id}/tweets', params=params)
+            newest_id, more = _add_page(payload, tweets, newest_id, params)
+            if not more:
+                break
+        else:
+            # Older pages are still pending: keep the old watermark so the
+            # next run fetches them (seen tweets are deduplicated)
+            newest_id = None
+        return tweets, newest_id
+
+
+def _add_page(payload, tweets, newest_id, params):
+    """Fold one timeline page into `tweets`. Returns (newest_id, more pages)."""
+    if payload is None:
+        # Don't advance the watermark past pages we never saw; the
+        # tweets we did get are deduplicated on the next run
+        return None, False
+    tweets.extend(payload.get('data', []))
+    meta = payload.get('meta', {})
+    # Pages are newest first, so the first page carries the newest ID
+    newest_id = newest_id or meta.get('newest_id')
+    next_token = meta.get('next_token')
+    if not next_token:
+        return newest_id, False
+    params['pagination_token'] = next_token
+    return newest_id, True
+
+
+class AsyncTwitterClient:
+    """Non-blocking timeline fetches for the ASGI serving mode.
+
+    Shares the wrapped TwitterClient's token buckets, circuit breaker and
+    credentials, so sync and async calls draw from one rate-limit budget.
+    Requests go through a single pooled httpx.AsyncClient with keep-alive.
+    """
+
+    def __init__(self, client, max_connections=None, timeout=None):
+        if httpx is None:
+            raise RuntimeError('AsyncTwitterClient requires httpx')
+        self.client = client
+        self.max_connections = max_connections or client.pool_size
+        self.timeout = timeout or client.timeout
+        self._http = None
+
+    def _session(self):
+        # Created lazily so it binds to the running event loop
+        if self._http is None:
+            timeout = self.timeout
+            if isinstance(timeout, tuple):
+                timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+            self._http = httpx.AsyncClient(
+                base_url=self.client.api_base,
+                headers=self.client.headers,
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _get(self, bucket_name, path, params=None):
+        client = self.client
+        bucket = client.buckets[bucket_name]
+        for attempt in range(client.retry.retries):
+            if not client.breaker.allow():
+                logger.warning(f"Twitter circuit open, skipping {path}")
+                return None
+            await bucket.acquire_async()
+            started = time.perf_counter()
+            try:
+                response = await self._session().get(path, params=params)
+                payload, kind = client._outcome(bucket_name, path, response, time.perf_counter() - started)
+            except Exception as e:
+                payload, kind = client._failed(bucket_name, path, e, time.perf_counter() - started)
+            if kind is None:
+                return payload
+            sleep_time = client.retry.delay(kind, attempt, client.breaker)
+            if sleep_time is None:
+                break
+            if sleep_time:
+                RETRY_SLEEP.inc(sleep_time, upstream='twitter')
+                await asyncio.sleep(sleep_time)
+        return None
+
+    async def get_user_tweets(self, user_id, params, max_pages=10):
+        # Same contract as TwitterClient.get_user_tweets
+        tweets = []
+        newest_id = None
+        params = dict(params)
+        for _ in range(max_pages):
+            payload = await self._get('tweets', f'/users/{user_id}/tweets', params=params)
+            newest_id, more = _add_page(payload, tweets, newest_id, params)
+            if not more:
+                break
+        else:
+            newest_id = None
+        return tweets, newest_id
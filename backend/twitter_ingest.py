@@ -0,0 +1,196 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Mention, ProcessedTweet, StockPick, TwitterAccount
+
+logger = logging.getLogger(__name__)
+
+# How long a username that didn't resolve is skipped before asking again
+UNKNOWN_USER_RETRY = timedelta(days=1)
+# Max IDs per IN (...) clause, well under SQLite's variable limit
+DEDUP_CHUNK_SIZE = 500
+# Rows per INSERT ... ON CONFLICT statement (at most 6 bound parameters each)
+UPSERT_BATCH_SIZE = 500
+
+
+def resolve_accounts(client, usernames):
+    """Return {username: TwitterAccount}, only asking the API about names not stored yet."""
+    keys = {name.lower(): name for name in usernames}
+    known = {
+        account.username: account
+        for account in TwitterAccount.query.filter(TwitterAccount.username.in_(list(keys))).all()
+    }
+
+    now = datetime.utcnow()
+    pending = [
+        keys[key] for key in keys
+        if key not in known
+        or (known[key].user_id is None and now - known[key].resolved_at > UNKNOWN_USER_RETRY)
+    ]
+    if pending:
+        logger.info(f"Resolving {len(pending)} Twitter usernames")
+        for key, user_id in client.lookup_user_ids(pending).items():
+            account = known.get(key)
+            if account is None:
+                account = TwitterAccount(username=key)
+                db.session.add(account)
+                known[key] = account
+            account.user_id = user_id
+            account.resolved_at = now
+        db.session.commit()
+
+    return {
+        keys[key]: known[key]
+        for key in keys
+        if key in known and known[key].user_id
+    }
+
+
+def _timeline_query(params, since_id):
+    # Accounts with a watermark only fetch tweets newer than it
+    query = dict(params)
+    if since_id:
+        query.pop('start_time', None)
+        query['since_id'] = since_id
+    return query
+
+
+def timeline_requests(client, usernames):
+    """{username: (user_id, since_id)} for every followed account that resolves."""
+    accounts = resolve_accounts(client, usernames)
+    return {name: (account.user_id, account.last_tweet_id) for name, account in accounts.items()}
+
+
+def fetch_timelines(client, accounts, params, max_workers=4, max_pages=10):
+    """Fetch timelines for {username: (user_id, since_id)} concurrently.
+
+    Accounts with a watermark only fetch tweets newer than it; the others use
+    `params` as given (e.g. a start_time). All workers share the client's
+    per-endpoint token bucket, so the pool size only bounds concurrency.
+    Returns {username: (tweets, newest_id)}.
+    """
+    if not accounts:
+        return {}
+
+    def fetch(item):
+        username, (user_id, since_id) = item
+        try:
+            return username, client.get_user_tweets(user_id, _timeline_query(params, since_id), max_pages=max_pages)
+        except Exception as e:
+            logger.error(f"Error fetching tweets for {username}: {str(e)}")
+            return username, ([], None)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='twitter') as pool:
+        return dict(pool.map(fetch, accounts.items()))
+
+
+async def fetch_timelines_async(client, accounts, params, concurrency=4, max_pages=10):
+    """fetch_timelines for an AsyncTwitterClient, without a thread per request."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(username, user_id, since_id):
+        async with semaphore:
+            try:
+                return username, await client.get_user_tweets(
+                    user_id, _timeline_query(params, since_id), max_pages=max_pages
+                )
+            except Exception as e:
+                logger.error(f"Error fetching tweets for {username}: {str(e)}")
+                return username, ([], None)
+
+    results = await asyncio.gather(*(
+        fetch(username, user_id, since_id) for username, (user_id, since_id) in accounts.items()
+    ))
+    return dict(results)
+
+
+def _already_processed(tweet_ids):
+    seen = set()
+    for i in range(0, len(tweet_ids), DEDUP_CHUNK_SIZE):
+        chunk = tweet_ids[i:i + DEDUP_CHUNK_SIZE]
+        seen.update(
+            tweet_id for (tweet_id,) in
+            db.session.query(ProcessedTweet.tweet_id).filter(ProcessedTweet.tweet_id.in_(chunk))
+        )
+    return seen
+
+
+def stage_new_tweets(timelines):
+    """Keep only tweets not seen before and stage the bookkeeping for them.
+
+    `timelines` is {username: (tweets, newest_id)}. Returns {username: [new
+    tweets]}. ProcessedTweet rows and the advanced since_id watermarks are
+    added to the session but not committed, so the caller commits them in
+    the same transaction as the mention counts.
+    """
+    accounts = {
+        account.username: account
+        for account in TwitterAccount.query.filter(
+            TwitterAccount.username.in_([name.lower() for name in timelines])
+        ).all()
+    }
+
+    all_ids = [tweet['id'] for tweets, _ in timelines.values() for tweet in tweets]
+    seen = _already_processed(all_ids)
+    now = datetime.utcnow()
+
+    new_tweets = {}
+    for username, (tweets, newest_id) in timelines.items():
+        fresh = []
+        for tweet in tweets:
+            if tweet['id'] in seen:
+                continue
+            seen.add(tweet['id'])
+            fresh.append(tweet)
+            db.session.add(ProcessedTweet(tweet_id=tweet['id'], username=username, processed_at=now))
+        new_tweets[username] = fresh
+
+        account = accounts[username.lower()]
+        if newest_id and (account.last_tweet_id is None or int(newest_id) > int(account.last_tweet_id)):
+            account.last_tweet_id = newest_id
+
+    return new_tweets
+
+
+def parse_tweet_time(value):
+    # Twitter returns e.g. 2024-05-01T13:45:00.000Z; stored as naive UTC
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def record_mentions(rows):
+    """Insert Mention rows, ignoring (tweet_id, ticker) pairs already stored."""
+    for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(Mention).values(rows[i:i + UPSERT_BATCH_SIZE])
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=['tweet_id', 'ticker']))
+
+
+def upsert_ai_picks(daily_mentions, update_time):
+    """Merge {(ticker, tweet day): count} into the AI picks with one upsert per batch."""
+    keys = list(daily_mentions)
+    for i in range(0, len(keys), UPSERT_BATCH_SIZE):
+        rows = [{
+            'ticker': ticker,
+            'source': 'AI',
+            'date': day,
+            'mention_count': daily_mentions[ticker, day],
+            'last_updated': update_time
+        } for ticker, day in keys[i:i + UPSERT_BATCH_SIZE]]
+
+        stmt = insert(StockPick).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['ticker', 'source', 'date'],
+            set_={
+                'mention_count': StockPick.mention_count + stmt.excluded.mention_count,
+                'last_updated': stmt.excluded.last_updated
+            }
+        )
+        db.session.execute(stmt)
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
+import useQuoteStream from '../hooks/useQuoteStream';
 
 interface Position {
   id: number;
@@ -46,11 +47,15 @@ const PositionsTable: React.FC<PositionsTableProps> = ({ type }) => {
     };
 
     fetchData();
-    // Refresh every 30 seconds instead of every minute to get more frequent updates
-    const interval = setInterval(fetchData, 30000);
+    // Prices arrive over the quote stream; this only picks up added or closed positions
+    const interval = setInterval(fetchData, 300000);
     return () => clearInterval(interval);
   }, [type]);
 
+  const liveQuotes = useQuoteStream(
+    type === 'closed' ? [] : positions.filter(p => p.status === type).map(p => p.ticker)
+  );
+
   const calculateRealTimePerformance = (position: Position) => {
     if (!position.current_price) return position.performance;
     
@@ -85,7 +90,15 @@ const PositionsTable: React.FC<PositionsTableProps> = ({ type }) => {
     };
   };
 
-  const displayData = type === 'closed' ? trades : positions.filter(p => p.status === type);
+  const displayData = type === 'closed'
+    ? trades
+    : positions
+        .filter(p => p.status === type)
+        .map(p => liveQuotes[p.ticker] ? {
+          ...p,
+          current_price: liveQuotes[p.ticker].current_price,
+          daily_change: liveQuotes[p.ticker].daily_change
+        } : p);
 
   return (
     <div className="position-table">
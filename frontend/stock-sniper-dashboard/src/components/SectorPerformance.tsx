@@ -1,5 +1,5 @@
-import React, { useEffect, useState } from 'react';
-import axios from 'axios';
+import React, { useState } from 'react';
+import useQuoteStream from '../hooks/useQuoteStream';
 
 interface SectorData {
   ticker: string;
@@ -8,7 +8,7 @@ interface SectorData {
 }
 
 const SectorPerformance: React.FC = () => {
-  const [sectors, setSectors] = useState<SectorData[]>([
+  const [sectors] = useState<SectorData[]>([
     { ticker: 'XLK', name: 'Technology', performance: 0 },
     { ticker: 'XLF', name: 'Financials', performance: 0 },
     { ticker: 'XLE', name: 'Energy', performance: 0 },
@@ -21,23 +21,12 @@ const SectorPerformance: React.FC = () => {
     { ticker: 'XLU', name: 'Utilities', performance: 0 }
   ]);
 
-  useEffect(() => {
-    const fetchSectorData = () => {
-      const tickers = sectors.map(s => s.ticker).join(',');
-      axios.get(`http://127.0.0.1:5001/sectors?tickers=${tickers}`)
-        .then(response => {
-          setSectors(prev => prev.map(sector => ({
-            ...sector,
-            performance: response.data[sector.ticker]?.daily_change ?? 0
-          })));
-        })
-        .catch(error => console.error('Error fetching sector data:', error));
-    };
-
-    fetchSectorData();
-    const interval = setInterval(fetchSectorData, 30000);
-    return () => clearInterval(interval);
-  }, []);
+  // Sector ETF changes are pushed by the server as they move
+  const liveQuotes = useQuoteStream(sectors.map(s => s.ticker));
+  const displaySectors = sectors.map(sector => ({
+    ...sector,
+    performance: liveQuotes[sector.ticker]?.daily_change ?? sector.performance
+  }));
 
   const getTrendStyle = (performance: number) => ({
     color: performance > 0 ? 'var(--positive)' : performance < 0 ? 'var(--negative)' : 'var(--neutral)'
@@ -51,7 +40,7 @@ const SectorPerformance: React.FC = () => {
 
   return (
     <div className="sectors-grid">
-      {sectors.map((sector) => (
+      {displaySectors.map((sector) => (
         <div key={sector.ticker} className="sector-item">
           <div className="sector-header">
             <span className="sector-ticker">${sector.ticker}</span>
@@ -0,0 +1,51 @@
+import { useEffect, useState } from 'react';
+
+export interface StreamQuote {
+  current_price: number | null;
+  daily_change: number | null;
+  as_of: string | null;
+}
+
+interface CompactQuote {
+  p: number | null;
+  c: number | null;
+  t: string | null;
+}
+
+const expand = (quote: CompactQuote): StreamQuote => ({
+  current_price: quote.p,
+  daily_change: quote.c,
+  as_of: quote.t
+});
+
+// Live quotes from the backend's /stream endpoint. The server sends a snapshot
+// on connect and afterwards only the tickers whose price changed.
+const useQuoteStream = (tickers: string[]) => {
+  const [quotes, setQuotes] = useState<Record<string, StreamQuote>>({});
+  const key = [...new Set(tickers)].sort().join(',');
+
+  useEffect(() => {
+    if (!key) return;
+
+    const source = new EventSource(`http://127.0.0.1:5001/stream?tickers=${encodeURIComponent(key)}`);
+    const merge = (event: MessageEvent) => {
+      const data: Record<string, CompactQuote> = JSON.parse(event.data);
+      setQuotes(prev => {
+        const next = { ...prev };
+        Object.entries(data).forEach(([ticker, quote]) => {
+          next[ticker] = expand(quote);
+        });
+        return next;
+      });
+    };
+
+    source.addEventListener('snapshot', merge as EventListener);
+    source.addEventListener('quotes', merge as EventListener);
+    source.onerror = () => console.error('Quote stream disconnected, retrying...');
+    return () => source.close();
+  }, [key]);
+
+  return quotes;
+};
+
+export default useQuoteStream;